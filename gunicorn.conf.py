@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+
+"""
+    Gunicorn configuration used in production.
+
+    Usage:
+        gunicorn run:app
+
+    Gunicorn loads this file automatically from the working directory.
+"""
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', 8000)}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+#Read by create_app, the governor capacity defaults to the threads of each worker.
+os.environ["GUNICORN_THREADS"] = str(threads)
+
+#The app is imported once in the master and shared with the workers.
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+#Restarts workers periodically to limit memory growth, jitter avoids restarting all of them at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+def post_fork(server, worker):
+    """
+        Runs in each worker before it accepts connections.
+    """
+    from run import app
+    from myapp import db
+    from myapp.blueprints.health.health import warm_up
+
+    #Connections opened by the master must not be shared with the workers.
+    with app.app_context():
+        db.engine.dispose(close=False)
+    warm_up(app, connections=threads)
+    server.log.info("Worker %s warmed up", worker.pid)
@@ -1,11 +1,20 @@
 from flask import Flask
-from .extensions import db, mail_extension, jwt
+from werkzeug.middleware.proxy_fix import ProxyFix
+from .extensions import db, mail_extension, jwt, profiler, governor, limiter
 from dotenv import load_dotenv, find_dotenv
 from .models import *
 from .blueprints.validation.auth import auth_bp
 from .blueprints.email.mail import bp_mail
 from .blueprints.menu.menu import bp_menu
 from .blueprints.product.products import bp_product
+from .blueprints.health.health import bp_health
+from .seed import seed
+from .revocation import denylist
+from .catalog import catalog_cache, ensure_catalog_version
+from .idempotency import idempotency
+from .tenancy import tenant_resolver, ensure_default_tenant
+from .changelog_archive import changelog_archive, archive_changelog
+from .schema import upgrade_database
 from datetime import timedelta
 
 import os
@@ -18,33 +27,116 @@ def create_app():
     app.config["JSON_AS_ASCII"] = False
     
     #Flask-mail
-    app.config["MAIL_SERVER"] = "smtp.gmail.com"
-    app.config["MAIL_PORT"] = 587
-    app.config["MAIL_USE_TLS"] = True
-    app.config["MAIL_USE_SSL"] = False
+    app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+    app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", 587))
+    app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS", "True").lower() == "true"
+    app.config["MAIL_USE_SSL"] = os.getenv("MAIL_USE_SSL", "False").lower() == "true"
     app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
     app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
+    app.config["MAIL_MAX_EMAILS"] = int(os.getenv("MAIL_MAX_EMAILS", 0)) or None
+    app.config["MAIL_BASE_URL"] = os.getenv("MAIL_BASE_URL")
+    app.config["MAIL_REMINDER_RATE"] = float(os.getenv("MAIL_REMINDER_RATE", 5))
+    app.config["MAIL_TOKEN_MAX_AGE"] = int(os.getenv("MAIL_TOKEN_MAX_AGE", 180))
+    app.config["MAIL_REMINDER_TOKEN_MAX_AGE"] = int(os.getenv("MAIL_REMINDER_TOKEN_MAX_AGE", 7 * 86400))
 
     #JWT
     app.config["SECURITY_SALT"] = os.getenv("SECURITY_SALT")
     app.config["JWT_SECRET_KEY"] = os.getenv("SECRET_KEY")
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
     app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(hours=12)
+    app.config["JWT_REVOCATION_SYNC_SECONDS"] = int(os.getenv("JWT_REVOCATION_SYNC_SECONDS", 5))
+    app.config["JWT_REVOCATION_SYNC_MARGIN"] = int(os.getenv("JWT_REVOCATION_SYNC_MARGIN", 60))
 
     #Sql-alchemy
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI")
+    app.config["DB_AUTO_MIGRATE"] = os.getenv("DB_AUTO_MIGRATE", "True").lower() == "true"
+
+    #Catalog cache
+    app.config["CATALOG_VERSION_CHECK_SECONDS"] = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", 1))
+    app.config["CATALOG_SNAPSHOT_DIR"] = os.getenv("CATALOG_SNAPSHOT_DIR")
+    app.config["CATALOG_CACHE_MAX_ENTRIES"] = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 256))
+
+    #Changelog archive
+    app.config["CHANGELOG_ARCHIVE_DIR"] = os.getenv("CHANGELOG_ARCHIVE_DIR")
+    app.config["CHANGELOG_RETENTION_DAYS"] = int(os.getenv("CHANGELOG_RETENTION_DAYS", 90))
+
+    #Tenants
+    app.config["TENANT_REFRESH_SECONDS"] = int(os.getenv("TENANT_REFRESH_SECONDS", 60))
+
+    #Idempotency keys
+    app.config["IDEMPOTENCY_TTL_SECONDS"] = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+    #Longer than the gunicorn timeout, so a reservation only expires once its worker was killed.
+    app.config["IDEMPOTENCY_LEASE_SECONDS"] = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 2 * int(os.getenv("GUNICORN_TIMEOUT", 30))))
+    app.config["IDEMPOTENCY_CACHE_SIZE"] = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 1000))
+
+    #Profiling (disabled unless a sample rate or an endpoint is set)
+    app.config["PROFILE_SAMPLE_RATE"] = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    app.config["PROFILE_ENDPOINTS"] = {endpoint.strip() for endpoint in os.getenv("PROFILE_ENDPOINTS", "").split(",") if endpoint.strip()}
+    app.config["PROFILE_DIR"] = os.getenv("PROFILE_DIR")
+
+    #Load shedding (GOVERNOR_LIMITS example: "bp_product.get_log=2,auth_bp=4")
+    #A worker never runs more requests than its threads, so the capacity defaults to them and cant exceed them.
+    threads = int(os.getenv("GUNICORN_THREADS", 0))
+    capacity = int(os.getenv("GOVERNOR_CAPACITY", threads))
+    app.config["GOVERNOR_CAPACITY"] = min(capacity, threads) if threads else capacity
+    app.config["GOVERNOR_LIMITS"] = {key.strip(): int(limit) for key, _, limit in (item.partition("=") for item in os.getenv("GOVERNOR_LIMITS", "").split(",")) if limit}
+    app.config["GOVERNOR_PRIORITIES"] = {
+        "bp_health": "high",
+        "bp_menu": "high",
+        "bp_product.get_products": "high",
+        "bp_product": "normal",
+        "auth_bp": "low",
+        "bp_mail": "low"
+    }
+    app.config["GOVERNOR_CLASS_SHARES"] = {"high": 1.0, "normal": 0.75, "low": 0.5}
+    app.config["GOVERNOR_RETRY_AFTER"] = int(os.getenv("GOVERNOR_RETRY_AFTER", 1))
+
+    #Reverse proxies (amount of proxies in front of the app that set X-Forwarded-For/Proto/Host)
+    app.config["TRUSTED_PROXIES"] = int(os.getenv("TRUSTED_PROXIES", 0))
+
+    #Rate limiting ("capacity/seconds" token buckets)
+    app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "True").lower() == "true"
+    app.config["RATELIMIT_STORAGE_URI"] = os.getenv("RATELIMIT_STORAGE_URI")
+    app.config["RATELIMIT_MAX_KEYS"] = int(os.getenv("RATELIMIT_MAX_KEYS", 10000))
+    app.config["RATELIMIT_RULES"] = {
+        "login": {"ip": "20/60", "email": "5/300"},
+        "register": {"ip": "5/3600"},
+        "send-mail": {"ip": "5/600", "email": "3/3600"}
+    }
+
+    #The client IP (used by the rate limiter), scheme and host are read from the proxy headers.
+    if app.config["TRUSTED_PROXIES"]:
+        proxies = app.config["TRUSTED_PROXIES"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
 
     #Blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(bp_mail, url_prefix='/mail')
     app.register_blueprint(bp_menu)
     app.register_blueprint(bp_product)
+    app.register_blueprint(bp_health)
+
+    #Commands
+    app.cli.add_command(seed)
+    app.cli.add_command(archive_changelog)
 
     mail_extension.init_app(app)
     db.init_app(app)
+    tenant_resolver.init_app(app)
     jwt.init_app(app)
+    denylist.init_app(app)
+    catalog_cache.init_app(app)
+    idempotency.init_app(app)
+    changelog_archive.init_app(app)
+    governor.init_app(app)
+    limiter.init_app(app)
+    profiler.init_app(app)
 
     with app.app_context():
+        if app.config["DB_AUTO_MIGRATE"]:
+            upgrade_database()
         db.create_all()
+        ensure_default_tenant()
+        ensure_catalog_version()
 
     return app
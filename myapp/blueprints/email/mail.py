@@ -1,26 +1,102 @@
-from flask import Blueprint, request, jsonify, render_template
-from myapp import db, users, mail_extension
+from flask import Blueprint, request, jsonify, render_template, current_app
+from myapp import db, users, tenants, mail_extension, limiter, DEFAULT_TENANT
+from myapp.idempotency import idempotency
+from myapp.tenancy import current_tenant
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 import os
+import time
+import click
+from functools import lru_cache
 from flask_mail import Message, sanitize_address
 from email_validator import validate_email, EmailNotValidError
-from smtplib import SMTPException
+from smtplib import SMTPException, SMTPServerDisconnected
 
-bp_mail = Blueprint("bp_mail", __name__, template_folder="templates", static_folder="static")
+bp_mail = Blueprint("bp_mail", __name__, template_folder="templates", static_folder="static", cli_group="mail")
+
+def get_serializer():
+    """
+        Returns the serializer used to sign the verification tokens.
+    """
+    return URLSafeTimedSerializer(os.getenv("SECRET_KEY"))
+
+def reminder_salt():
+    """
+        Salt of the tokens sent by `flask mail send-reminders`, they last MAIL_REMINDER_TOKEN_MAX_AGE instead of MAIL_TOKEN_MAX_AGE.
+    """
+    return f'{os.getenv("SECURITY_SALT")}:reminder'
+
+def load_token(serializer, token):
+    """
+        Returns (tenant, mail) from a verification or reminder token.
+        Tokens issued before tenants existed only contain the email and belong to the default tenant.
+
+        Raises:
+            SignatureExpired: If the token is older than the lifetime of its kind.
+            BadSignature: If the token is not valid.
+    """
+    try:
+        payload = serializer.loads(token, salt=os.getenv("SECURITY_SALT"), max_age=current_app.config["MAIL_TOKEN_MAX_AGE"])
+    except SignatureExpired:
+        raise
+    except BadSignature:
+        payload = serializer.loads(token, salt=reminder_salt(), max_age=current_app.config["MAIL_REMINDER_TOKEN_MAX_AGE"])
+    if isinstance(payload, str):
+        return DEFAULT_TENANT, payload.lower()
+    return int(payload[0]), payload[1].lower()
+
+def verification_message(mail, html):
+    """
+        Builds the verification email for the given address.
+
+        Parameters:
+            `mail`(str): Recipient address.
+            `html`(str): Rendered body of the email.
+    """
+    return Message(
+        'Email verification',
+        recipients=[mail],
+        html=html,
+        sender=os.getenv('MAIL_DEFAULT_SENDER')
+    )
+
+TOKEN_PLACEHOLDER = "__VERIFICATION_TOKEN__"
+
+@lru_cache(maxsize=32)
+def verification_skeleton(base_url):
+    """
+        Renders the email template once per host and splits it around the token.
+
+        Parameters:
+            `base_url`(str): Root URL of the API, ex: "https://example.com/".
+
+        Returns:
+            Tuple (head, tail) with the HTML before and after the token.
+
+        ### Notes:
+        - Requires an application context.
+        - The cache is bounded because the host comes from the request headers.
+    """
+    html = render_template('template.html', route = base_url + "mail/validate/" + TOKEN_PLACEHOLDER, base_url = base_url)
+    head, _, tail = html.partition(TOKEN_PLACEHOLDER)
+    return head, tail
+
+def verification_html(base_url, token):
+    """
+        Returns the verification email body for the given token.
+        Tokens are URL safe, so they are inserted without escaping.
+    """
+    head, tail = verification_skeleton(base_url)
+    return head + token + tail
 
 def send_email(mail):
-        serializer = URLSafeTimedSerializer(os.getenv("SECRET_KEY"))
-        token = serializer.dumps(mail, salt=os.getenv("SECURITY_SALT"))
-        route = request.url_root + "mail/validate/%s" % token
-        msg = Message(
-            'Email verification',
-            recipients=[mail],
-            html= render_template('template.html', route = route, request = request),
-            sender=os.getenv('MAIL_DEFAULT_SENDER')
-        )
+        serializer = get_serializer()
+        token = serializer.dumps([current_tenant(), mail], salt=os.getenv("SECURITY_SALT"))
+        msg = verification_message(mail, verification_html(request.url_root, token))
         mail_extension.send(msg)
-    
+
 @bp_mail.route("/send-mail", methods=["POST"])
+@limiter.limit("send-mail")
+@idempotency.idempotent
 def resend_email():
     """
         Sends a confirmation link to the given email.
@@ -57,6 +133,10 @@ def resend_email():
 
             {"error": "The email is not registered."}
 
+        - 429 Too many requests
+
+            {"error": "Too many requests, try again later."}
+
         - 500 Internal error
 
             {"error": "Failed to send the email."} SMTP Exception
@@ -84,7 +164,7 @@ def resend_email():
     
     mail = sanitize_address(data["mail"]).lower()
 
-    verification_data = db.session.execute(db.select(users.email, users.verified).filter_by(email=mail)).first()
+    verification_data = db.session.execute(db.select(users.email, users.verified).filter_by(tenant_id=current_tenant(), email=mail)).first()
 
     if verification_data is None:
         return jsonify({"error": "The email is not registered."}), 404
@@ -125,6 +205,9 @@ def validate_token(token):
             {"error": "Verification failed.", "details": "Wrong token."}
             {"error": "The email is already verified."}
 
+        - 404 Not found
+
+            {"error": "The email is not registered."}
 
         - 500 Internal error
 
@@ -132,27 +215,121 @@ def validate_token(token):
 
 
         ### Notes:
-        - The token is set to last for 180 seconds.        
+        - The token lasts MAIL_TOKEN_MAX_AGE seconds (180 by default), the tokens of the reminder
+          emails last MAIL_REMINDER_TOKEN_MAX_AGE (7 days by default).
+        - The email is verified with a single conditional UPDATE, the state is only read when it fails.
+        - The token contains the restaurant of the account, so the link works with or without the /t/<slug>/ prefix.
     """
-    serializer = URLSafeTimedSerializer(os.getenv("SECRET_KEY"))
+    serializer = get_serializer()
     try:
-        mail = serializer.loads(token, salt=os.getenv("SECURITY_SALT"), max_age=180)
-
-        verified = db.session.execute(db.select(users.verified).filter_by(email=mail.lower())).first()
-
-        #Checks if the email is verified.
-        if verified[0]:
-            return jsonify({"error": "The email is already verified."}), 400
+        tenant, mail = load_token(serializer, token)
 
-        db.session.execute(db.update(users).where(users.email == mail).values(verified = True))
+        result = db.session.execute(db.update(users).where(users.tenant_id == tenant, users.email == mail, users.verified == False).values(verified = True))
         db.session.commit()
-        return jsonify({"message": "Email verified."}), 200
-    except BadSignature:
-        return jsonify({"error": "Verification failed.", "details": "Wrong token."}), 400
+        if result.rowcount:
+            return jsonify({"message": "Email verified."}), 200
+
+        #Checks why nothing was updated.
+        verified = db.session.execute(db.select(users.verified).filter_by(tenant_id=tenant, email=mail)).first()
+        if verified is None:
+            return jsonify({"error": "The email is not registered."}), 404
+        return jsonify({"error": "The email is already verified."}), 400
     except SignatureExpired :
         return jsonify({"error": "The token is no longer available."}), 400
+    except BadSignature:
+        return jsonify({"error": "Verification failed.", "details": "Wrong token."}), 400
     except Exception as e:
         print(f"Error: {e}")
         db.session.rollback()
         return jsonify({"error": "An internal error occurred. Please try again later."}), 500
-    
\ No newline at end of file
+
+
+@bp_mail.cli.command("send-reminders")
+@click.option("--base-url", default=None, help="Public URL of the API used to build the links. Defaults to MAIL_BASE_URL.")
+@click.option("--chunk-size", default=500, show_default=True, help="Amount of users loaded from the database per query.")
+@click.option("--rate", type=float, default=None, help="Maximum emails sent per second, 0 disables throttling. Defaults to MAIL_REMINDER_RATE.")
+@click.option("--limit", type=int, default=None, help="Stops after sending this amount of emails.")
+@click.option("--tenant", "tenant_slug", default=None, help="Only sends the reminders of this restaurant (slug). Defaults to every restaurant.")
+def send_reminders(base_url, chunk_size, rate, limit, tenant_slug):
+    """
+        Sends a new verification email to every unverified user.
+
+        ### Usage
+            flask mail send-reminders --base-url https://example.com/ --rate 5
+            flask mail send-reminders --tenant otro-local
+
+        ### Notes:
+        - Users are streamed in chunks ordered by ID, so the table is never fully loaded in memory.
+        - The serializer and the email skeleton are built once for the whole batch.
+        - Every email is sent through a single SMTP connection (it reconnects every MAIL_MAX_EMAILS emails if set).
+        - If the server drops the connection it reconnects, emails that still fail are counted as failed and skipped.
+        - Point MAIL_SERVER / MAIL_PORT to a local SMTP sink to try it without sending real emails.
+    """
+    base_url = base_url or current_app.config.get("MAIL_BASE_URL")
+    if not base_url:
+        raise click.UsageError("Missing --base-url (or MAIL_BASE_URL).")
+    base_url = base_url.rstrip("/") + "/"
+
+    conditions = [users.verified == False]
+    if tenant_slug is not None:
+        tenant = db.session.execute(db.select(tenants.tenant_id).where(tenants.slug == tenant_slug)).scalar()
+        if tenant is None:
+            raise click.UsageError(f"Unknown tenant: {tenant_slug}")
+        conditions.append(users.tenant_id == tenant)
+
+    rate = current_app.config["MAIL_REMINDER_RATE"] if rate is None else rate
+    interval = 1 / rate if rate > 0 else 0
+
+    serializer = get_serializer()
+    #Reminders are read long after the batch is sent, their links use a longer lived token.
+    salt = reminder_salt()
+
+    sent = failed = 0
+    last_id = 0
+    last_sent = 0.0
+    with mail_extension.connect() as connection:
+        while limit is None or sent < limit:
+            chunk = db.session.execute(
+                db.select(users.user_id, users.email, users.tenant_id)
+                .where(*conditions, users.user_id > last_id)
+                .order_by(users.user_id)
+                .limit(chunk_size)
+            ).all()
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+
+            for _, mail, tenant_id in chunk:
+                if limit is not None and sent >= limit:
+                    break
+
+                wait = last_sent + interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+
+                msg = verification_message(mail, verification_html(base_url, serializer.dumps([tenant_id, mail], salt=salt)))
+                try:
+                    if connection.host is None:
+                        #The previous reconnection failed.
+                        connection.host = connection.configure_host()
+                    connection.send(msg)
+                    sent += 1
+                except SMTPServerDisconnected:
+                    #Reconnects once, if it fails again only this email is skipped.
+                    try:
+                        connection.host = connection.configure_host()
+                        connection.send(msg)
+                        sent += 1
+                    except (SMTPException, OSError) as e:
+                        connection.host = None
+                        failed += 1
+                        print(f"SMTP error ({mail}): {e}")
+                except (SMTPException, OSError) as e:
+                    failed += 1
+                    print(f"SMTP error ({mail}): {e}")
+                last_sent = time.monotonic()
+
+            #Ends the read transaction between chunks.
+            db.session.rollback()
+
+    click.echo(f"Reminders sent: {sent}, failed: {failed}")
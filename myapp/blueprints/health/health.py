@@ -0,0 +1,78 @@
+from flask import Blueprint, jsonify, current_app
+from myapp import db
+from myapp.catalog import catalog_cache
+from myapp.revocation import denylist
+from ..product.products import build_product_list
+from ..email.mail import verification_skeleton
+
+bp_health = Blueprint("bp_health", __name__)
+
+def warm_up(app, connections=1):
+    """
+        Prepares a worker before it receives traffic.
+
+        Parameters:
+            `app`(Flask): Application instance.
+            `connections`(int): Database connections opened in advance (ex: one per thread).
+
+        ### Steps:
+        - Opens the database connections of the pool.
+        - Compiles the templates.
+        - Loads the catalog cache and the token denylist.
+        - Renders the verification email skeleton if MAIL_BASE_URL is set.
+    """
+    with app.app_context():
+        pool = [db.engine.connect() for _ in range(max(connections, 1))]
+        for connection in pool:
+            connection.execute(db.text("SELECT 1"))
+            connection.close()
+
+        for template in ("menu.html", "template.html"):
+            app.jinja_env.get_template(template)
+
+        catalog_cache.get("products", build_product_list)
+        denylist.sync(force=True)
+        if app.config.get("MAIL_BASE_URL"):
+            verification_skeleton(app.config["MAIL_BASE_URL"].rstrip("/") + "/")
+        db.session.remove()
+
+    app.extensions["ready"] = True
+
+@bp_health.route("/healthz", methods=["GET"])
+def healthz():
+    """
+        Liveness probe, returns 200 while the process can answer requests.
+
+        ### Endpoint
+        - Method: GET
+        - URL: /healthz
+    """
+    return jsonify({"status": "ok"}), 200
+
+@bp_health.route("/readyz", methods=["GET"])
+def readyz():
+    """
+        Readiness probe, returns 200 once the worker is warm and the database answers.
+
+        ### Endpoint
+        - Method: GET
+        - URL: /readyz
+
+        ### Responses:
+        - 200 Ok
+
+            {"status": "ready"}
+
+        - 503 Service unavailable
+
+            {"status": "warming up"}
+            {"status": "database unavailable"}
+    """
+    if not current_app.extensions.get("ready"):
+        return jsonify({"status": "warming up"}), 503
+    try:
+        db.session.execute(db.text("SELECT 1"))
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"status": "database unavailable"}), 503
+    return jsonify({"status": "ready"}), 200
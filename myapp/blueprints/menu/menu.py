@@ -1,5 +1,6 @@
-from flask import Blueprint, redirect, render_template, url_for
+from flask import Blueprint, redirect, render_template, url_for, jsonify
 from myapp import db, products
+from myapp.menu_history import read_menu_version
 
 bp_menu = Blueprint("bp_menu", __name__, template_folder="templates", static_folder="static", static_url_path="/menu/static")
 
@@ -26,3 +27,39 @@ def menu():
     return render_template('menu.html')
 
 
+@bp_menu.route("/menu/versions/<int:version>", methods=["GET"])
+def menu_version(version):
+    """
+        Returns the products of the menu as they were in the given catalog version.
+
+        ### Endpoint
+        - Method: GET
+        - URL: /menu/versions/<int:version>
+
+        ### Responses:
+        - 200 Ok
+
+            {"version": 12, "products": [{"product_name": ..., "price": ..., "description": ..., "category": ...}]}
+
+        - 404 Not found
+
+            {"error": "Version not found."}
+
+        - 500 Internal error
+
+            {"error": "Internal server error."}
+
+        ### Notes:
+        - Versions never change, so the response can be cached by the browser.
+    """
+    try:
+        version, product_list = read_menu_version(version=version)
+        if version is None:
+            return jsonify({"error": "Version not found."}), 404
+        response = jsonify({"version": version, "products": product_list})
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response, 200
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"error": "Internal server error."}), 500
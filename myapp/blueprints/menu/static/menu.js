@@ -1,12 +1,25 @@
 const container = document.getElementById("all-tables-container");
+// Each restaurant (/t/<slug>/menu) keeps its own copy.
+const CACHE_KEY = `menu-catalog:${location.pathname}`;
 
-async function get_list() {
-    let lista = await fetch('/products').then(response => response.json());
-    return lista;
+// Returns the last catalog saved in the browser ({etag, products}) or null
+function read_cache() {
+    try {
+        return JSON.parse(localStorage.getItem(CACHE_KEY));
+    } catch (error) {
+        return null;
+    }
 }
 
-async function get_categories() {
-    let products = await get_list();  // Ensure products are fetched before continuing
+function write_cache(etag, products) {
+    try {
+        localStorage.setItem(CACHE_KEY, JSON.stringify({etag: etag, products: products}));
+    } catch (error) {
+        // Storage full or disabled, the menu still works without cache
+    }
+}
+
+function get_categories(products) {
     let categories = {};
 
     products.forEach(product => {
@@ -21,50 +34,79 @@ async function get_categories() {
     return categories;
 }
 
-async function create_tables() {
-    let categories = await get_categories();  // Wait until categories are fetched
-    let counter = 0
-    let container_number = 0;
+// Builds the table of a category. Uses textContent so product data is never parsed as HTML
+function create_table(category, products) {
+    let table_container = document.createElement("div");
+    table_container.className = "table-container";
+
+    let header = document.createElement("h1");
+    header.className = "headers";
+    header.id = `header-${category}`;
+    header.textContent = category;
+
+    let table = document.createElement("table");
+    table.id = category;
+
+    products.forEach(producto => {
+        let row = table.insertRow();
+
+        let name = row.insertCell();
+        let description = document.createElement("p");
+        description.textContent = producto.description;
+        name.append(producto.product_name, document.createElement("br"), description);
+
+        let price = row.insertCell();
+        price.id = "price";
+        price.textContent = `$${Math.round(producto.price)}`;
+    });
+
+    table_container.append(header, document.createElement("hr"), table);
+    return table_container;
+}
+
+function create_tables(products) {
+    let categories = get_categories(products);
+    let fragment = document.createDocumentFragment();
+    let pair_container = null;
+
     // Gets each category key and creates a table for each one
-    Object.keys(categories).forEach(category => {
+    Object.keys(categories).forEach((category, counter) => {
         //This sections creates a new container every 2 iterations to allow 
         // only 2 tables per container.
         if (counter % 2 === 0) {
-            container_number ++;
-            let cat_container = `
-                <div class="two-tables-container" id="tables-${container_number}"></div>
-            `;
-            container.insertAdjacentHTML("beforeend", cat_container);
+            pair_container = document.createElement("div");
+            pair_container.className = "two-tables-container";
+            pair_container.id = `tables-${counter / 2 + 1}`;
+            fragment.append(pair_container);
         }
-
-        let menu = document.getElementById(`tables-${container_number}`);
-
-        let table = `
-            <div class="table-container">
-                <h1 class="headers" id="header-${category}">${category}</h1>
-                <hr>
-                <table id="${category}">
-                </table>
-            </div>
-        `;
-        menu.insertAdjacentHTML("beforeend", table);
-
-        // Gets each product from the current category and adds it to the corresponding table
-        let select_table = document.getElementById(category);
-        categories[category].forEach(producto => {
-            let show_product = `
-                <tr>
-                    <td>${producto.product_name}<br><p>${producto.description}</p></td>
-                    <td id="price">$${Math.round(producto.price)}</td>
-                </tr>
-            `;
-            select_table.insertAdjacentHTML("beforeend", show_product);
-        });
-
-        counter ++;
+        pair_container.append(create_table(category, categories[category]));
     });
 
+    // Single DOM update for the whole menu
+    container.replaceChildren(fragment);
+    show_options(Object.keys(categories));
+}
+
+// Renders the cached catalog right away and then asks the server for changes
+async function load_menu() {
+    let cached = read_cache();
+    if (cached) {
+        create_tables(cached.products);
+    }
+
+    let headers = cached && cached.etag ? {"If-None-Match": cached.etag} : {};
+    try {
+        let response = await fetch('products', {headers: headers, cache: "no-store"});
+        if (response.status === 304 || !response.ok) {
+            return;
+        }
+        let products = await response.json();
+        write_cache(response.headers.get("ETag"), products);
+        create_tables(products);
+    } catch (error) {
+        // Offline, the cached menu stays on screen
+    }
 }
 
 
-create_tables();  // Start the table creation process
+load_menu();  // Start the table creation process
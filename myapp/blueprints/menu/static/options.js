@@ -1,28 +1,17 @@
 const options = document.getElementById("options");
 
-async function get_categories() {
-    let products = await fetch('/products').then(response => response.json());
-    let categories = {};
+// Creates a button for each category, called by menu.js every time the menu is rendered
+function show_options(categories) {
+    let fragment = document.createDocumentFragment();
+    categories.forEach(category => {
+        let link = document.createElement("a");
+        link.href = `#header-${category}`;
 
-    products.forEach(product => {
-        if (!categories[product.category]){
-            categories[product.category] = null
-        }
-    });
-
-    return categories
-}
+        let button = document.createElement("button");
+        button.textContent = category.toUpperCase();
 
-async function show_options() {
-    let categories = await get_categories()
-    Object.keys(categories).forEach(category => {
-        let show_category = `
-            <a href="#header-${category}">
-                <button>${category.toUpperCase()}</button>
-            </a>
-        `
-        options.insertAdjacentHTML("beforeend", show_category)
-    })
+        link.append(button);
+        fragment.append(link);
+    });
+    options.replaceChildren(fragment);
 }
-
-show_options();
\ No newline at end of file
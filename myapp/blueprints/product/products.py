@@ -1,17 +1,78 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from myapp import db, products, change_logg
+from myapp.catalog import catalog_cache, bump_catalog_version
+from myapp.menu_history import read_menu_version
+from myapp.idempotency import idempotency
+from myapp.tenancy import current_tenant
+from myapp.changelog_archive import changelog_archive
+from myapp.dialects import supports_delete_returning, supports_update_returning
 import json
+import math
+from datetime import datetime
+from decimal import Decimal
 
 
 bp_product = Blueprint("bp_product", __name__)
 
+def build_product_list():
+    """
+        Returns the serialized list of available products of the current tenant used by the menu.
+    """
+    product_list = db.session.execute(db.select(products.product_name, products.price, products.description, products.category).where(products.tenant_id == current_tenant(), products.available == True)).all() 
+    product_list = [products.to_basic_dict(product[0], product[1], product[2], product[3]) for product in product_list]
+    return current_app.json.dumps(product_list).encode("utf-8")
+
 @bp_product.route("/products", methods=["GET"])
 def get_products():
+    """
+        Returns the available products.
+
+        ### Endpoint
+        - Method: GET
+        - URL: /products
+
+        - Query parameters (optional): as_of (ISO date or datetime)
+
+        ### Responses:
+        - 200 Ok, list of products
+        - 400 Bad request
+
+            {"error": "as_of must be an ISO date."}
+
+        - 404 Not found
+
+            {"error": "There is no menu before that date."}
+
+        ### Notes:
+        - The list is cached by catalog version and the response has an ETag, requests
+          with a matching If-None-Match header get a 304 response.
+        - With as_of returns the menu as it was on that date.
+    """
+    if "as_of" in request.args:
+        try:
+            as_of = datetime.fromisoformat(request.args["as_of"])
+        except ValueError:
+            return jsonify({"error": "as_of must be an ISO date."}), 400
+        try:
+            version, product_list = read_menu_version(as_of=as_of)
+            if version is None:
+                return jsonify({"error": "There is no menu before that date."}), 404
+            response = jsonify(product_list)
+            response.set_etag(f"catalog-{version}")
+            return response.make_conditional(request)
+        except Exception as e:
+            print(f"Error: {e}")
+            return jsonify(error="Internal server error."), 500
+
     try:
-        product_list = db.session.execute(db.select(products.product_name, products.price, products.description, products.category).where(products.available == True)).all() 
-        product_list = [products.to_basic_dict(product[0], product[1], product[2], product[3]) for product in product_list]
-        return jsonify(product_list), 200
+        version, data = catalog_cache.get("products", build_product_list)
+        if catalog_cache.snapshot_dir:
+            response = send_file(data, mimetype="application/json", conditional=False, etag=False, max_age=0)
+        else:
+            response = current_app.response_class(data, mimetype="application/json")
+        response.set_etag(f"catalog-{version}")
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Error: {e}")
         return jsonify(error="Internal server error."), 500
@@ -50,8 +111,8 @@ def get_products_data():
                     "price": 1500.0,
                     "description": "somedescription",
                     "category": "somecategory",
-                    "available": True
-
+                    "available": True,
+                    "version": 1
                 }
             ]
     
@@ -81,7 +142,7 @@ def get_products_data():
         if product_order is None:
             return jsonify({"error": "Value not supported.", "Supported_values": ["product_id", "product_name", "price", "description", "category", "available"]}), 400
 
-        prod = db.session.query(products).order_by(product_order).all()
+        prod = db.session.query(products).where(products.tenant_id == current_tenant()).order_by(product_order).all()
 
         product_list = [product.toDict() for product in prod]
         return jsonify({"products": product_list}), 200
@@ -92,6 +153,7 @@ def get_products_data():
 
 @bp_product.route("/products/add", methods=["POST"])
 @jwt_required()
+@idempotency.idempotent
 def add_product():
     """
         Adds products to the menu. This endpoint is protected by JWT validation.
@@ -147,10 +209,13 @@ def add_product():
     
     try:
         user = json.loads(get_jwt_identity())
-        product = products(product_name=data["product_name"], price=data["price"], description=data["description"], category=data["category"], available=data["available"])
-        log = change_logg(user_id = user["id"], log=f'{user["name"]} added a product:  {data["product_name"]}')
+        fields = {key: data[key] for key in required_keys}
+        product = products(tenant_id=current_tenant(), **fields)
         db.session.add(product)
+        db.session.flush()
+        log = change_logg(tenant_id=current_tenant(), user_id = user["id"], log=f'{user["name"]} added a product:  {data["product_name"]}', product_id=product.product_id, action="add", changes=fields)
         db.session.add(log)
+        bump_catalog_version([data["category"]])
         db.session.commit()
 
         return jsonify({"message": "Product added!"}), 201
@@ -159,8 +224,106 @@ def add_product():
         db.session.rollback()
         return jsonify({"error": "An internal error occurred. Please try again later."}), 500
     
+def requested_version(data):
+    """
+        Returns the product version the client based its change on, taken from the If-Match header
+        or the "version" key of the payload. None means the write is unconditional.
+
+        Raises:
+            ValueError: If the version is not an integer.
+    """
+    if request.if_match:
+        if request.if_match.star_tag:
+            return None
+        tags = request.if_match.as_set()
+        if len(tags) != 1:
+            raise ValueError("If-Match must contain a single version.")
+        return int(tags.pop())
+    if isinstance(data, dict) and data.get("version") is not None:
+        if isinstance(data["version"], bool):
+            raise ValueError("version must be an integer.")
+        return int(data["version"])
+    return None
+
+def invalid_value(key, value):
+    """
+        Returns why the value cant be stored in the given product column, None if it is valid.
+    """
+    if key == "price":
+        column = products.__table__.c.price.type
+        limit = 10 ** (column.precision - column.scale)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or not 0 < value < limit:
+            return f"price must be a positive number below {limit}."
+    elif key == "available":
+        if not isinstance(value, bool):
+            return "available must be true or false."
+    else:
+        length = products.__table__.c[key].type.length
+        if not isinstance(value, str) or not value.strip() or len(value) > length:
+            return f"{key} must be a non-empty string of up to {length} characters."
+    return None
+
+def same_value(old, new):
+    """
+        Compares a stored value with the one sent by the client (ex: Decimal("1500.00") and 1500.0).
+    """
+    if isinstance(old, Decimal) and isinstance(new, (int, float)) and not isinstance(new, bool):
+        return old == Decimal(str(new))
+    return old == new
+
+def compare_and_swap(ID, fields, version):
+    """
+        Updates the product only if it still has the expected version. The current values are read first
+        to know which fields change, without a row lock: the UPDATE only matches if they are still the same,
+        so a concurrent change of the same fields (or of the category) ends in a 409.
+
+        Parameters:
+            `ID`(int): Product ID.
+            `fields`(dict): New values.
+            `version`(int): Expected version, None updates unconditionally.
+
+        Returns:
+            (status, version, changes, categories): 200, the new version (None if it is unknown: unconditional
+            update on a database without UPDATE ... RETURNING), the fields whose value changed and the
+            categories whose menu changed. 404 and None, or 409 and the current version.
+            Nothing is written when no value changes.
+    """
+    conditions = [products.product_id == ID, products.tenant_id == current_tenant()]
+    if version is not None:
+        conditions.append(products.version == version)
+    columns = {key: getattr(products, key) for key in ["category", *fields]}
+    row = db.session.execute(db.select(products.version, *columns.values()).where(*conditions)).first()
+    if row is not None:
+        old = dict(zip(columns, row[1:]))
+        changes = {key: value for key, value in fields.items() if not same_value(old[key], value)}
+        if not changes:
+            return 200, row[0], {}, []
+        categories = list({old["category"], changes.get("category", old["category"])})
+        statement = (db.update(products)
+            .where(*conditions, *(column == old[key] for key, column in columns.items()))
+            .values(**changes, version=products.version + 1))
+        if supports_update_returning():
+            new_version = db.session.execute(statement.returning(products.version)).scalar()
+            if new_version is not None:
+                return 200, new_version, changes, categories
+        elif db.session.execute(statement).rowcount:
+            return 200, version + 1 if version is not None else None, changes, categories
+    #The product is missing, has another version or changed after the read.
+    current = db.session.execute(db.select(products.version).where(*conditions[:2])).scalar()
+    return (404, None, None, None) if current is None else (409, current, None, None)
+
+def conflict_response(current):
+    return jsonify({"error": "The product was modified by someone else.", "version": current}), 409
+
+def updated_response(version):
+    response = jsonify({"message": "Product updated!"} if version is None else {"message": "Product updated!", "version": version})
+    if version is not None:
+        response.set_etag(str(version))
+    return response, 200
+
 @bp_product.route("/products/update", methods=["PUT"])
 @jwt_required()
+@idempotency.idempotent
 def update_product():
     """
         Updates the given product if exists.
@@ -183,7 +346,8 @@ def update_product():
                 "price": 2000.0,
                 "description": "newdescription",
                 "category": "newcategory",
-                "available": True
+                "available": True,
+                "version": 3
             }
 
         ### Responses:
@@ -191,22 +355,29 @@ def update_product():
 
         - 200 Updated
 
-            {"message": "Product updated!"}
+            {"message": "Product updated!", "version": 4}
 
         - 400 Bad request
 
             {"error": "Missing keys.", "Required_keys": f"{required_keys}"}
+            {"error": "Invalid version.", "details": "..."}
 
         - 404 Not found
 
             {"error": "The product doesnt exists."} 
 
+        - 409 Conflict
+
+            {"error": "The product was modified by someone else.", "version": 5}
+
         - 500 Internal error
 
             {"error": "An internal error occurred. Please try again later."}
 
         ### Note
-        - This endpoint adds a change log when a product is modified.
+        - This endpoint adds a change log with the fields whose value changed, nothing is written if none changed.
+        - The version (If-Match header or "version" key) is optional, when sent the product is only
+          updated if nobody changed it since that version.
     """
     if not request.is_json:
         return jsonify({"error": "Request must be JSON type."}), 400
@@ -216,24 +387,248 @@ def update_product():
     required_keys = {"product_id", "product_name", "price", "description", "category", "available"}
     if not required_keys.issubset(data):
         return jsonify({"error": "Missing keys.", "Required_keys": f"{required_keys}"}), 400
+
+    try:
+        version = requested_version(data)
+    except ValueError as e:
+        return jsonify({"error": "Invalid version.", "details": str(e)}), 400
     
     try:
         user = json.loads(get_jwt_identity())
-        result= db.session.execute(db.update(products).where(products.product_id == data["product_id"]).values(product_name=data["product_name"], description=data["description"], price=data["price"], available=data["available"], category=data["category"]))
-        if not result.rowcount:
+        fields = {key: data[key] for key in required_keys - {"product_id"}}
+        status, version, changes, categories = compare_and_swap(data["product_id"], fields, version)
+        if status == 404:
+            return jsonify({"error": "The product doesnt exists."}), 404
+        if status == 409:
+            return conflict_response(version)
+        if not changes:
+            return updated_response(version)
+        log = change_logg(tenant_id=current_tenant(), user_id = user["id"], log=f'{user["name"]} changed a product:  {data["product_name"]}', product_id=data["product_id"], action="update", changes=changes)
+        db.session.add(log)
+        bump_catalog_version(categories)
+        db.session.commit()
+        return updated_response(version)
+    except Exception as e:
+        print(f"Error: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An internal error occurred. Please try again later."}), 500
+
+
+@bp_product.route("/products/<int:ID>", methods=["PATCH"])
+@jwt_required()
+@idempotency.idempotent
+def patch_product(ID):
+    """
+        Updates only the given fields of a product.
+
+        ### Endpoint
+        - Method: PATCH
+        - URL: /products/<id:int>
+        - Content-type: JSON
+
+        ### Authorization
+        - This endpoint is protected by JWT validation.
+
+        ### Header example:
+            {"If-Match": "\"3\""}
+
+        ### Payload example:
+            {"price": 2100.0, "version": 3}
+
+        ### Responses:
+        Content-type: JSON
+
+        - 200 Updated
+
+            {"message": "Product updated!", "version": 4}
+
+        - 400 Bad request
+
+            {"error": "Request must be JSON type."}
+            {"error": "Nothing to update.", "Supported_keys": [...]}
+            {"error": "Unknown keys.", "Supported_keys": [...]}
+            {"error": "Invalid values.", "details": ["price must be a positive number below 100000000."]}
+            {"error": "Invalid version.", "details": "..."}
+
+        - 404 Not found
+
+            {"error": "The product doesnt exists."}
+
+        - 409 Conflict
+
+            {"error": "The product was modified by someone else.", "version": 5}
+
+        - 500 Internal error
+
+            {"error": "An internal error occurred. Please try again later."}
+
+        ### Note
+        - This endpoint adds a change log with the fields whose value changed, nothing is written if none changed.
+        - The version (If-Match header or "version" key) is optional, when sent the product is only
+          updated if nobody changed it since that version.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON type."}), 400
+
+    data = request.get_json()
+
+    supported_keys = ["product_name", "price", "description", "category", "available"]
+    if not isinstance(data, dict):
+        return jsonify({"error": "Nothing to update.", "Supported_keys": supported_keys}), 400
+    try:
+        version = requested_version(data)
+    except ValueError as e:
+        return jsonify({"error": "Invalid version.", "details": str(e)}), 400
+    data = {key: value for key, value in data.items() if key != "version"}
+    if not data:
+        return jsonify({"error": "Nothing to update.", "Supported_keys": supported_keys}), 400
+    if not set(data).issubset(supported_keys):
+        return jsonify({"error": "Unknown keys.", "Supported_keys": supported_keys}), 400
+    errors = [error for error in (invalid_value(key, value) for key, value in data.items()) if error is not None]
+    if errors:
+        return jsonify({"error": "Invalid values.", "details": errors}), 400
+
+    try:
+        user = json.loads(get_jwt_identity())
+        status, version, changes, categories = compare_and_swap(ID, data, version)
+        if status == 404:
             return jsonify({"error": "The product doesnt exists."}), 404
-        log = change_logg(user_id = user["id"], log=f'{user["name"]} changed a product:  {data["product_name"]}')
+        if status == 409:
+            return conflict_response(version)
+        if not changes:
+            return updated_response(version)
+        name = data.get("product_name", f"#{ID}")
+        log = change_logg(tenant_id=current_tenant(), user_id = user["id"], log=f'{user["name"]} changed a product:  {name} ({", ".join(changes)})', product_id=ID, action="update", changes=changes)
         db.session.add(log)
+        bump_catalog_version(categories)
+        db.session.commit()
+        return updated_response(version)
+    except Exception as e:
+        print(f"Error: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An internal error occurred. Please try again later."}), 500
+
+
+@bp_product.route("/products/availability", methods=["POST"])
+@jwt_required()
+@idempotency.idempotent
+def set_availability():
+    """
+        Marks several products as available or unavailable with a single update.
+
+        ### Endpoint
+        - Method: POST
+        - URL: /products/availability
+        - Content-type: JSON
+
+        ### Authorization
+        - This endpoint is protected by JWT validation.
+
+        ### Payload examples:
+            {"available": false, "product_ids": [1, 2, 3]}
+            {"available": false, "category": "helados"}
+
+        ### Responses:
+        Content-type: JSON
+
+        - 200 Updated
+
+            {"message": "Availability updated!", "updated": 3}
+
+        - 400 Bad request
+
+            {"error": "Request must be JSON type."}
+            {"error": "Missing key: available"}
+            {"error": "Send either product_ids or category."}
+
+        - 500 Internal error
+
+            {"error": "An internal error occurred. Please try again later."}
+
+        ### Note
+        - Products that already have the requested availability are not modified.
+        - A single change log is added for the whole operation.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON type."}), 400
+
+    data = request.get_json()
+
+    if not isinstance(data, dict) or not isinstance(data.get("available"), bool):
+        return jsonify({"error": "Missing key: available"}), 400
+
+    ids = data.get("product_ids")
+    category = data.get("category")
+    if (ids is None) == (category is None):
+        return jsonify({"error": "Send either product_ids or category."}), 400
+    if ids is not None and not (isinstance(ids, list) and ids and all(isinstance(product_id, int) for product_id in ids)):
+        return jsonify({"error": "product_ids must be a list of IDs."}), 400
+
+    try:
+        user = json.loads(get_jwt_identity())
+        target = products.product_id.in_(ids) if ids is not None else products.category == category
+        statement = db.update(products).where(products.tenant_id == current_tenant(), target, products.available != data["available"]).values(available=data["available"], version=products.version + 1)
+        if category is not None:
+            updated = db.session.execute(statement).rowcount
+            categories = [category]
+        elif supports_update_returning():
+            changed = db.session.execute(statement.returning(products.category)).scalars().all()
+            updated, categories = len(changed), list(set(changed))
+        else:
+            updated = db.session.execute(statement).rowcount
+            categories = db.session.execute(db.select(products.category).distinct().where(products.tenant_id == current_tenant(), target)).scalars().all()
+        if updated:
+            state = "available" if data["available"] else "unavailable"
+            scope = f"category {category}" if category is not None else f"{len(ids)} products"
+            changes = {"available": data["available"], "product_ids" if category is None else "category": ids if category is None else category}
+            log = change_logg(tenant_id=current_tenant(), user_id = user["id"], log=f'{user["name"]} marked {updated} products as {state}: {scope}'[:250], action="availability", changes=changes)
+            db.session.add(log)
+            bump_catalog_version(categories)
         db.session.commit()
-        return jsonify({"message": "Product updated!"}), 200
+        return jsonify({"message": "Availability updated!", "updated": updated}), 200
     except Exception as e:
         print(f"Error: {e}")
         db.session.rollback()
         return jsonify({"error": "An internal error occurred. Please try again later."}), 500
     
 
+def delete_product_row(ID, version):
+    """
+        Deletes a product and returns its name and category.
+        Uses a single DELETE ... RETURNING when the database supports it.
+
+        Parameters:
+            `ID`(int): Product ID.
+            `version`(int): Expected version, None deletes unconditionally.
+
+        Returns:
+            ((name, category), 200), (None, 404), or (current version, 409).
+    """
+    conditions = [products.product_id == ID, products.tenant_id == current_tenant()]
+    if version is not None:
+        conditions.append(products.version == version)
+
+    if supports_delete_returning():
+        deleted = db.session.execute(db.delete(products).where(*conditions).returning(products.product_name, products.category)).first()
+        if deleted is not None:
+            return tuple(deleted), 200
+        current = db.session.execute(db.select(products.version).where(*conditions[:2])).scalar()
+        return (None, 404) if current is None else (current, 409)
+
+    #MySQL: reads the row and deletes it only if it didnt change in between.
+    row = db.session.execute(db.select(products.product_name, products.category, products.version).where(*conditions[:2])).first()
+    if row is None:
+        return None, 404
+    if version is not None and row[2] != version:
+        return row[2], 409
+    result = db.session.execute(db.delete(products).where(products.product_id == ID, products.version == row[2]))
+    if not result.rowcount:
+        return None, 409
+    return (row[0], row[1]), 200
+
 @bp_product.route("/products/delete", methods=["DELETE"])
 @jwt_required()
+@idempotency.idempotent
 def delete_product():
     """
         Deletes a product with the given ID.
@@ -272,12 +667,18 @@ def delete_product():
 
             {"error": "The product doenst exists."}
 
+        - 409 Conflict
+
+            {"error": "The product was modified by someone else.", "version": 5}
+
         - 500 Internal error
 
             {"error": "An internal error occurred. Please try again later."}
 
         ### Note
         - This endpoint adds a change log when a product is deleted.
+        - The version (If-Match header or "version" key) is optional, when sent the product is only
+          deleted if nobody changed it since that version.
     """
     if not request.is_json:
         return jsonify({"error": "Request must be JSON type."}), 400
@@ -286,15 +687,23 @@ def delete_product():
 
     if not "product_id" in data:
         return jsonify({"error": "Missing key: product_id"}), 400
+
+    try:
+        version = requested_version(data)
+    except ValueError as e:
+        return jsonify({"error": "Invalid version.", "details": str(e)}), 400
     
     try:
         user = json.loads(get_jwt_identity())
-        product_name = db.session.execute(db.select(products.product_name).where(products.product_id == data["product_id"])).first()
-        if not product_name:
+        product_name, status = delete_product_row(data["product_id"], version)
+        if status == 404:
             return jsonify({"error": "The product doenst exists."}), 404
-        db.session.execute(db.delete(products).where(products.product_id == data["product_id"]))
-        log = change_logg(user_id=user["id"], log=f'{user["name"]} deleted a product: {product_name[0]}')
+        if status == 409:
+            db.session.rollback()
+            return conflict_response(product_name)
+        log = change_logg(tenant_id=current_tenant(), user_id=user["id"], log=f'{user["name"]} deleted a product: {product_name[0]}', product_id=data["product_id"], action="delete", changes={"product_name": product_name[0]})
         db.session.add(log)
+        bump_catalog_version([product_name[1]])
         db.session.commit()
         return jsonify({"message": "Product deleted!"}), 200
     except Exception as e:
@@ -330,9 +739,12 @@ def get_product_id(ID):
             "price" : 1500.0,
             "category" : "some category",
             "description" : "some description",
-            "available" : True
+            "available" : True,
+            "version" : 1
         }
 
+        The ETag header contains the version, it can be sent back in If-Match when updating the product.
+
     - 404 Not found
 
         {"error": "Product not found"}
@@ -350,16 +762,64 @@ def get_product_id(ID):
         return jsonify({"error" : "ID must be a positive integer"}), 400
     
     try:
-        product = db.session.query(products).where(products.product_id == ID).first()
+        product = db.session.query(products).where(products.product_id == ID, products.tenant_id == current_tenant()).first()
         if product is None:
             return jsonify({"error": "Product not found."}), 404
         else:
-            return jsonify(product.toDict()), 200
+            response = jsonify(product.toDict())
+            response.set_etag(str(product.version))
+            return response, 200
     except Exception as e:
         print(f"Error: {str(e)}")
         return jsonify({"error" : "Internal server error"}), 500
 
 
+def changelog_params(args):
+    """
+        Parses the changelog filters of the query string.
+
+        ### Supported parameters:
+        - `product_id`, `user_id` (int)
+        - `action` (add, update, delete, availability)
+        - `from`, `to` (ISO date or datetime, `to` is exclusive)
+
+        Returns:
+            Dictionary with the given filters.
+
+        Raises:
+            ValueError: If a parameter has an invalid value.
+    """
+    params = {}
+    for key in ("product_id", "user_id"):
+        if key in args:
+            params[key] = int(args[key])
+    if "action" in args:
+        if args["action"] not in change_logg.ACTIONS:
+            raise ValueError(f"action must be one of {', '.join(change_logg.ACTIONS)}")
+        params["action"] = args["action"]
+    for key in ("from", "to"):
+        if key in args:
+            params[key] = datetime.fromisoformat(args[key])
+    return params
+
+def changelog_filters(params):
+    """
+        Builds the WHERE conditions of the changelog queries from the parsed filters, scoped to the current tenant.
+    """
+    conditions = [change_logg.tenant_id == current_tenant()]
+    for key in ("product_id", "user_id", "action"):
+        if key in params:
+            conditions.append(getattr(change_logg, key) == params[key])
+    if "from" in params:
+        conditions.append(change_logg.date >= params["from"])
+    if "to" in params:
+        conditions.append(change_logg.date < params["to"])
+    return conditions
+
+def includes_archive(params):
+    #Archived entries are only read for date range queries.
+    return "from" in params or "to" in params
+
 @bp_product.route("/products/changelog", methods=["GET"])
 @jwt_required()
 def get_log():
@@ -369,6 +829,7 @@ def get_log():
         ### Endpoint
         - Method: GET
         - URL: /products/changelog
+        - Query parameters (optional): product_id, user_id, action, from, to, limit
 
         ### Authorization
         - This endpoint is protected by JWT validation
@@ -377,6 +838,10 @@ def get_log():
 
             {"Authorization": "Bearer {JWT-HERE}"}
 
+        ### Request example:
+
+            /products/changelog?product_id=42&from=2025-01-01&limit=50
+
 
         ### Response:
         Content-type: JSON
@@ -388,20 +853,108 @@ def get_log():
                     "log_id": 0, 
                     "user_id": 1, 
                     "log": "someaction", 
-                    "date": "2025-01-16T12:00:00Z"
+                    "date": "2025-01-16T12:00:00Z",
+                    "product_id": 42,
+                    "action": "update",
+                    "changes": {"price": 2000.0}
                 }
             ]
 
+        - 400 Bad request
+
+            {"error": "Invalid filter.", "details": "..."}
+
         - 500 Internal error
 
             {"error": "Internal server error"}
+
+        ### Notes:
+        - Entries moved to the archive (flask archive-changelog) are included when from or to is sent.
     """
     try:
-        logs = db.session.query(change_logg).order_by(change_logg.id_log.desc()).all()
+        params = changelog_params(request.args)
+        limit = None
+        if "limit" in request.args:
+            if not request.args["limit"].isdigit() or int(request.args["limit"]) < 1:
+                raise ValueError("limit must be a positive integer.")
+            limit = int(request.args["limit"])
+    except ValueError as e:
+        return jsonify({"error": "Invalid filter.", "details": str(e)}), 400
+
+    try:
+        logs = db.session.query(change_logg).where(*changelog_filters(params)).order_by(change_logg.id_log.desc()).limit(limit).all()
         log_list = [log.toDict() for log in logs]
+        if includes_archive(params):
+            #When the limit is already filled only newer archived entries can make it into the result.
+            above = log_list[-1]["log_id"] if limit is not None and len(log_list) >= limit else None
+            log_list.extend(changelog_archive.search(current_tenant(), params, above))
+            log_list = sorted(log_list, key=lambda log: log["log_id"], reverse=True)[:limit]
         return jsonify(log_list), 200
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
-    
\ No newline at end of file
+@bp_product.route("/products/changelog/stats", methods=["GET"])
+@jwt_required()
+def get_log_stats():
+    """
+        Returns the amount of changes grouped by day, by user or by both. The counts are computed by the database.
+
+        ### Endpoint
+        - Method: GET
+        - URL: /products/changelog/stats
+        - Query parameters: group (day, user or user_day, default day) and the filters of /products/changelog
+
+        ### Authorization
+        - This endpoint is protected by JWT validation
+
+        ### Response:
+        Content-type: JSON
+
+        - 200 Ok
+
+            [
+                {"day": "2025-01-16", "user_id": 1, "count": 12}
+            ]
+
+        - 400 Bad request
+
+            {"error": "Invalid filter.", "details": "..."}
+
+        - 500 Internal error
+
+            {"error": "Internal server error"}
+
+        ### Notes:
+        - Entries moved to the archive (flask archive-changelog) are counted when from or to is sent.
+    """
+    columns = {
+        "day": [db.func.date(change_logg.date).label("day")],
+        "user": [change_logg.user_id],
+        "user_day": [db.func.date(change_logg.date).label("day"), change_logg.user_id]
+    }
+    group = request.args.get("group", "day")
+    if group not in columns:
+        return jsonify({"error": "Invalid filter.", "details": f"group must be one of {', '.join(columns)}"}), 400
+    try:
+        params = changelog_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": "Invalid filter.", "details": str(e)}), 400
+
+    try:
+        keys = columns[group]
+        rows = db.session.execute(
+            db.select(*keys, db.func.count().label("count")).where(*changelog_filters(params)).group_by(*keys).order_by(*keys)
+        ).mappings().all()
+        rows = [{key: str(value) if key == "day" else value for key, value in row.items()} for row in rows]
+        if includes_archive(params):
+            names = [key.key for key in keys]
+            counts = {tuple(row[name] for name in names): row["count"] for row in rows}
+            for log in changelog_archive.search(current_tenant(), params):
+                group_key = tuple(log["date"].date().isoformat() if name == "day" else log[name] for name in names)
+                counts[group_key] = counts.get(group_key, 0) + 1
+            rows = [{**dict(zip(names, group_key)), "count": count} for group_key, count in sorted(counts.items())]
+        return jsonify(rows), 200
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
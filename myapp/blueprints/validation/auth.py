@@ -1,22 +1,43 @@
-from flask import Blueprint, request, jsonify
-from myapp.models import users
-from myapp import db, jwt
+from flask import Blueprint, request, jsonify, current_app
+from myapp.models import users, DEFAULT_TENANT
+from myapp import db, jwt, limiter
+from myapp.revocation import denylist
+from myapp.idempotency import idempotency
+from myapp.tenancy import current_tenant
 import os
 from email_validator import validate_email, EmailNotValidError
 from flask_jwt_extended import create_access_token, create_refresh_token
 from flask_mail import sanitize_address
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 import json
+import click
 from ..email.mail import send_email
 from smtplib import SMTPException
+from sqlalchemy.exc import IntegrityError
+from myapp.dialects import is_unique_violation
 
-auth_bp = Blueprint('auth_bp', __name__)
+auth_bp = Blueprint('auth_bp', __name__, cli_group="auth")
 
 @jwt.user_identity_loader
 def user_loader(user):
     return json.dumps(user)
 
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return denylist.is_revoked(jwt_payload)
+
+@jwt.token_verification_loader
+def check_token_tenant(jwt_header, jwt_payload):
+    #Tokens issued before tenants existed belong to the default tenant.
+    return json.loads(jwt_payload["sub"]).get("tenant", DEFAULT_TENANT) == current_tenant()
+
+@jwt.token_verification_failed_loader
+def wrong_tenant(jwt_header, jwt_payload):
+    return jsonify({"error": "The token belongs to another restaurant."}), 401
+
 @auth_bp.route("/register", methods=["POST"])
+@limiter.limit("register")
+@idempotency.idempotent
 def register_user():
     """
         Register endpoint that works with a pre-made secret key. 
@@ -47,6 +68,10 @@ def register_user():
             {"error": "Incorrect registration key."}
             {"error" : "Missing data. Required fields: name, mail, password, key"}
 
+        - 429 Too many requests
+
+            {"error": "Too many requests, try again later."}
+
         - 500 Internal error
 
             {"error" : "An error ocurred while creating the account."}
@@ -54,6 +79,7 @@ def register_user():
         ### Notes:
         - The secret key must be stored as a environment variable.
         - Passwords are securely hashed, plain-text is never stored.
+        - Accounts belong to the restaurant of the URL (/t/<slug>/register), the same email can be registered in several restaurants.
 
     """
     if not request.is_json:
@@ -82,21 +108,25 @@ def register_user():
     #Adds the user 
     try:
         hashed_password_str = users.hash_password(data["password"])
-        user = users(user_name=data["name"], email=mail, password=hashed_password_str)
+        user = users(tenant_id=current_tenant(), user_name=data["name"], email=mail, password=hashed_password_str)
         db.session.add(user)
         db.session.commit()
         send_email(mail)
         return jsonify({"message": "Account succesfully created!"}), 201
-    except Exception as e:
+    except IntegrityError as e:
         db.session.rollback()
-        if "UNIQUE constraint failed" in str(e):
+        if is_unique_violation(e):
             return jsonify({"error": "The email already exists."}), 400
-        else:
-            print(f"Error: {e}")
-            return jsonify({"error" : "An error ocurred while creating the account."}), 500
+        print(f"Error: {e}")
+        return jsonify({"error" : "An error ocurred while creating the account."}), 500
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error: {e}")
+        return jsonify({"error" : "An error ocurred while creating the account."}), 500
         
 
 @auth_bp.route("/login", methods=["POST"])
+@limiter.limit("login")
 def login():
     """
     Log in system with mail and password validation.
@@ -130,8 +160,12 @@ def login():
 
         {"error": "The email is not registered."}
 
+    - 429 Too many requests
+
+        {"error": "Too many requests, try again later."}
+
     ### Notes:
-    - The JWT (access_token) contains the users name and id.
+    - The JWT (access_token) contains the users name, id and restaurant, it is rejected by the other restaurants.
     - Passwords are securely hashed.
     """
 
@@ -150,7 +184,7 @@ def login():
         mail = sanitize_address(validate_email(data["mail"].lower()).normalized)
 
         #Checks if the email is registered. 
-        verification_data = db.session.query(users).filter_by(email=mail).first()
+        verification_data = db.session.query(users).filter_by(tenant_id=current_tenant(), email=mail).first()
         if verification_data is None:
             return jsonify({"error": "The email is not registered."}), 404
         hashed_password = verification_data.password
@@ -172,7 +206,7 @@ def login():
                 print(f"An error ocurred: {e}")
                 return jsonify({"error": "An internal error occurred. Please try again later."}), 500
         
-        identity= {"id": verification_data.user_id, "name": verification_data.user_name}
+        identity= {"id": verification_data.user_id, "name": verification_data.user_name, "tenant": verification_data.tenant_id}
         access_token = create_access_token(identity=identity)
         refresh_token = create_refresh_token(identity=identity)
         return jsonify(access_token=access_token, refresh_token=refresh_token), 200
@@ -195,20 +229,107 @@ def refresh_token():
         ### Authorization:
         - This endpoint uses JWT for authorization.
 
+        ### Notes:
+        - The refresh token used stays valid until it expires or is revoked by /logout or /logout-all.
+
     """
     identity = json.loads(get_jwt_identity())
     access_token = create_access_token(identity=identity)
     refresh_token = create_refresh_token(identity=identity)
     return jsonify(access_token = access_token, refresh_token=refresh_token), 200
-    
 
-    
+@auth_bp.route("/logout", methods=["POST"])
+@jwt_required(verify_type=False)
+def logout():
+    """
+        Revokes the token used in the request.
 
+        ### Endpoint
+        - Method: POST
+        - URL: /logout
 
+        ### Authorization:
+        - Accepts access and refresh tokens, call it once with each one to close the session.
 
+        ### Responses:
+        - 200 Ok
 
+            {"message": "Token revoked."}
 
+        - 500 Internal error
+
+            {"error": "Internal server error, try again."}
+    """
+    try:
+        denylist.revoke(get_jwt())
+        db.session.commit()
+        return jsonify({"message": "Token revoked."}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error: {e}")
+        return jsonify({"error": "Internal server error, try again."}), 500
 
+@auth_bp.route("/logout-all", methods=["POST"])
+@jwt_required(verify_type=False)
+def logout_all():
+    """
+        Revokes every access and refresh token issued to the user until now.
 
+        ### Endpoint
+        - Method: POST
+        - URL: /logout-all
 
-    
\ No newline at end of file
+        ### Authorization:
+        - Accepts access and refresh tokens.
+
+        ### Responses:
+        - 200 Ok
+
+            {"message": "All sessions revoked."}
+
+        - 500 Internal error
+
+            {"error": "Internal server error, try again."}
+
+        ### Notes:
+        - Other workers apply the revocation after their next sync (JWT_REVOCATION_SYNC_SECONDS).
+    """
+    user = json.loads(get_jwt_identity())
+    lifetime = max(current_app.config["JWT_ACCESS_TOKEN_EXPIRES"], current_app.config["JWT_REFRESH_TOKEN_EXPIRES"])
+    try:
+        denylist.revoke_all(user["id"], lifetime)
+        db.session.commit()
+        return jsonify({"message": "All sessions revoked."}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error: {e}")
+        return jsonify({"error": "Internal server error, try again."}), 500
+
+
+@auth_bp.route("/rate-limits", methods=["GET"])
+@jwt_required()
+def rate_limit_stats():
+    """
+        Returns the requests rejected by the rate limiter in this worker.
+
+        ### Endpoint
+        - Method: GET
+        - URL: /rate-limits
+
+        ### Authorization:
+        - This endpoint is protected by JWT validation.
+
+        ### Response example:
+        - 200 Ok
+
+            {"rejected": {"login:ip": 3, "send-mail:email": 1}}
+    """
+    return jsonify({"rejected": limiter.stats()}), 200
+
+
+@auth_bp.cli.command("prune-tokens")
+def prune_tokens():
+    """
+        Deletes the expired rows of the revoked tokens table.
+    """
+    click.echo(f"Expired revocations deleted: {denylist.prune()}")
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .extensions import db
+from .models import catalog_version, menu_versions, tenants
+from .menu_history import create_menu_version
+from .tenancy import current_tenant
+
+"""
+    Keeps the per-worker caches of the catalog coherent between workers and hosts.
+
+"""
+
+def bump_catalog_version(categories=None, tenant=None):
+    """
+        Increases the catalog version and saves the menu of the new version. Must be called in the same
+        transaction that changes `products`, the new version is visible to other workers once the transaction is committed.
+
+        Parameters:
+            `categories`(list): Categories modified by the transaction, None if unknown.
+            `tenant`(int): Tenant of the catalog, defaults to the tenant of the request.
+    """
+    tenant = tenant or current_tenant()
+    db.session.execute(db.update(catalog_version).where(catalog_version.tenant_id == tenant).values(version=catalog_version.version + 1))
+    version = db.session.execute(db.select(catalog_version.version).where(catalog_version.tenant_id == tenant)).scalar()
+    create_menu_version(version, categories, tenant)
+    db.session.info.setdefault("catalog_changed", set()).add(tenant)
+    return version
+
+def ensure_catalog_version(tenant=None):
+    """
+        Creates the version row and the first menu version of a tenant (every tenant by default) if they dont exist.
+    """
+    tenant_ids = [tenant] if tenant is not None else db.session.execute(db.select(tenants.tenant_id)).scalars().all()
+    for tenant_id in tenant_ids:
+        if db.session.get(catalog_version, tenant_id) is None:
+            db.session.add(catalog_version(tenant_id=tenant_id, version=0))
+            db.session.commit()
+        version = db.session.get(catalog_version, tenant_id).version
+        if db.session.get(menu_versions, (tenant_id, version)) is None:
+            create_menu_version(version, tenant=tenant_id)
+            db.session.commit()
+
+class CatalogCache:
+    """
+        Caches serialized catalog responses (ex: the public product list) by catalog version.
+
+        ### Config:
+        - `CATALOG_VERSION_CHECK_SECONDS (float)` Seconds between version checks, 0 checks on every read.
+        - `CATALOG_SNAPSHOT_DIR (str)` Optional folder shared by the workers of the same machine.
+        - `CATALOG_CACHE_MAX_ENTRIES (int)` Entries kept by the worker across every tenant.
+
+        ### Notes:
+        - A version check is a primary key lookup on `catalog_version`.
+        - Commits made by this worker invalidate the cache immediately, commits made by other workers
+          are seen on the next version check.
+        - With a snapshot folder the first worker that builds a version writes it to disk and the rest
+          serve that file, so the data is kept once in the OS page cache instead of once per worker.
+        - Versions and entries are kept per tenant. When the cache is full the entry is evicted from the
+          tenant holding the most entries, so a large restaurant cant push the others out of the cache.
+    """
+    def __init__(self, app=None):
+        self.entries = {}
+        self.versions = {}
+        self.interval = 1.0
+        self.max_entries = 256
+        self.snapshot_dir = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = float(app.config.get("CATALOG_VERSION_CHECK_SECONDS", 1))
+        self.max_entries = int(app.config.get("CATALOG_CACHE_MAX_ENTRIES", 256))
+        self.snapshot_dir = app.config.get("CATALOG_SNAPSHOT_DIR")
+        if self.snapshot_dir:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def invalidate(self, tenant=None):
+        """
+            Forces a version check on the next read of the tenant (of every tenant by default).
+        """
+        with self.lock:
+            if tenant is None:
+                self.versions.clear()
+            else:
+                self.versions.pop(tenant, None)
+
+    def current_version(self, tenant=None):
+        """
+            Returns the catalog version of the tenant, checking the database at most once every `interval` seconds.
+        """
+        tenant = tenant or current_tenant()
+        now = time.monotonic()
+        cached = self.versions.get(tenant)
+        if cached is not None and now - cached[1] < self.interval:
+            return cached[0]
+        version = db.session.execute(db.select(catalog_version.version).where(catalog_version.tenant_id == tenant)).scalar() or 0
+        self.versions[tenant] = (version, now)
+        return version
+
+    def snapshot_path(self, tenant, name, version):
+        return os.path.join(self.snapshot_dir, f"{tenant}-{name}.{version}.json")
+
+    def get(self, name, builder):
+        """
+            Returns (version, data) for the named entry, calling `builder()` only when the version changed.
+
+            Returns:
+                `data` is the serialized JSON (bytes), or the path of the shared snapshot when CATALOG_SNAPSHOT_DIR is set.
+        """
+        tenant = current_tenant()
+        version = self.current_version(tenant)
+        entry = self.entries.get((tenant, name))
+        if entry is not None and entry[0] == version:
+            if not self.snapshot_dir or os.path.exists(entry[1]):
+                return entry
+            #Another worker already replaced the snapshot, so this version is outdated.
+            self.invalidate(tenant)
+            version = self.current_version(tenant)
+
+        if self.snapshot_dir:
+            path = self.snapshot_path(tenant, name, version)
+            if not os.path.exists(path):
+                self._write_snapshot(tenant, name, version, builder())
+            entry = (version, path)
+        else:
+            entry = (version, builder())
+
+        with self.lock:
+            if (tenant, name) not in self.entries and len(self.entries) >= self.max_entries:
+                self._evict()
+            self.entries[(tenant, name)] = entry
+        return entry
+
+    def _evict(self):
+        #Removes the oldest entry of the tenant with the most entries.
+        counts = {}
+        for tenant, _ in self.entries:
+            counts[tenant] = counts.get(tenant, 0) + 1
+        largest = max(counts, key=counts.get)
+        del self.entries[next(key for key in self.entries if key[0] == largest)]
+
+    def _write_snapshot(self, tenant, name, version, data):
+        path = self.snapshot_path(tenant, name, version)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as file:
+            file.write(data)
+        os.replace(temp, path)
+        #Keeps the previous version for the workers that havent checked the version yet.
+        for filename in os.listdir(self.snapshot_dir):
+            prefix, _, old_version = filename[:-len(".json")].rpartition(".")
+            if filename.endswith(".json") and prefix == f"{tenant}-{name}" and old_version.isdigit() and int(old_version) < version - 1:
+                try:
+                    os.remove(os.path.join(self.snapshot_dir, filename))
+                except OSError:
+                    pass
+
+catalog_cache = CatalogCache()
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for tenant in session.info.pop("catalog_changed", ()):
+        catalog_cache.invalidate(tenant)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("catalog_changed", None)
@@ -0,0 +1,205 @@
+import gzip
+import json
+import os
+import threading
+import click
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from .extensions import db
+from .models import change_logg, tenants
+
+class ChangelogArchive:
+    """
+        Moves old changelog entries out of the `change_logg` table into compressed segment files,
+        and reads them back for the date range queries of the changelog endpoints.
+
+        ### Config:
+        - `CHANGELOG_ARCHIVE_DIR (str)` Folder of the segments, must be shared by every host that serves the API.
+        - `CHANGELOG_RETENTION_DAYS (int)` Days an entry stays in the table, used by `flask archive-changelog`.
+
+        ### Layout:
+        - `<dir>/<tenant>/<first id>-<last id>.jsonl.gz` One entry per line, in the format of toDict().
+        - `<dir>/<tenant>/index.json` Date range, ID range and size of every segment.
+
+        ### Notes:
+        - Segments are never modified once written, each run adds new ones.
+        - Queries only open the segments whose date range overlaps the requested one.
+        - Only one archive job should run at a time.
+    """
+    def __init__(self, app=None):
+        self.directory = None
+        self.retention_days = 90
+        self.indexes = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.get("CHANGELOG_ARCHIVE_DIR") or os.path.join(app.instance_path, "changelog_archive")
+        self.retention_days = int(app.config.get("CHANGELOG_RETENTION_DAYS", 90))
+
+    def tenant_dir(self, tenant):
+        return os.path.join(self.directory, str(tenant))
+
+    def read_index(self, tenant):
+        """
+            Returns the segments of the tenant, the index is only read again when the file changes.
+        """
+        path = os.path.join(self.tenant_dir(tenant), "index.json")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        cached = self.indexes.get(tenant)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding="utf-8") as file:
+            segments = json.load(file)["segments"]
+        for segment in segments:
+            for key in ("from", "to", "cutoff"):
+                segment[key] = datetime.fromisoformat(segment[key])
+        with self.lock:
+            self.indexes[tenant] = (mtime, segments)
+        return segments
+
+    def _write_index(self, tenant, segments):
+        path = os.path.join(self.tenant_dir(tenant), "index.json")
+        data = [{**segment, **{key: segment[key].isoformat() for key in ("from", "to", "cutoff")}} for segment in segments]
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as file:
+            json.dump({"segments": data}, file, indent=1)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, path)
+
+    def _write_segment(self, tenant, rows):
+        filename = f"{rows[0]['log_id']}-{rows[-1]['log_id']}.jsonl.gz"
+        path = os.path.join(self.tenant_dir(tenant), filename)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp, "wt", encoding="utf-8") as file:
+            for row in rows:
+                file.write(json.dumps({**row, "date": row["date"].isoformat()}, ensure_ascii=False))
+                file.write("\n")
+        with open(temp, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(temp, path)
+        return filename
+
+    def archive(self, tenant, cutoff, segment_size=50_000):
+        """
+            Moves the entries of the tenant older than `cutoff` to new segments.
+
+            Parameters:
+                `tenant`(int): Tenant ID.
+                `cutoff`(datetime): Entries with an older date are archived.
+                `segment_size`(int): Maximum entries per segment.
+
+            Returns:
+                Amount of archived entries.
+
+            ### Notes:
+            - Each segment is written and indexed before its rows are deleted. If a run is interrupted
+              in between, the next run deletes the rows of the last segment before archiving new ones,
+              so no entry is stored twice.
+        """
+        os.makedirs(self.tenant_dir(tenant), exist_ok=True)
+        segments = list(self.read_index(tenant))
+        if segments:
+            self._delete(tenant, segments[-1])
+
+        archived = 0
+        while True:
+            logs = db.session.execute(
+                db.select(change_logg)
+                .where(change_logg.tenant_id == tenant, change_logg.date < cutoff)
+                .order_by(change_logg.id_log)
+                .limit(segment_size)
+            ).scalars().all()
+            if not logs:
+                break
+            rows = [log.toDict() for log in logs]
+            segment = {
+                "file": self._write_segment(tenant, rows),
+                "rows": len(rows),
+                "first_id": rows[0]["log_id"],
+                "last_id": rows[-1]["log_id"],
+                "from": min(row["date"] for row in rows),
+                "to": max(row["date"] for row in rows),
+                "cutoff": cutoff
+            }
+            #A rerun after a crash rewrites the same file, it replaces its entry.
+            segments = [old for old in segments if old["file"] != segment["file"]] + [segment]
+            self._write_index(tenant, segments)
+            self._delete(tenant, segment)
+            archived += len(rows)
+        return archived
+
+    def _delete(self, tenant, segment):
+        db.session.execute(
+            db.delete(change_logg).where(
+                change_logg.tenant_id == tenant,
+                change_logg.id_log.between(segment["first_id"], segment["last_id"]),
+                change_logg.date < segment["cutoff"]
+            ),
+            execution_options={"synchronize_session": False}
+        )
+        db.session.commit()
+
+    def search(self, tenant, params, above=None):
+        """
+            Yields the archived entries of the tenant that match the changelog filters.
+
+            Parameters:
+                `tenant`(int): Tenant ID.
+                `params`(dict): Filters returned by `changelog_params` (product_id, user_id, action, from, to).
+                `above`(int): Only entries with a greater ID, used to skip segments when a limit is already filled.
+        """
+        start, end = params.get("from"), params.get("to")
+        for segment in self.read_index(tenant):
+            if (end is not None and segment["from"] >= end) or (start is not None and segment["to"] < start):
+                continue
+            if above is not None and segment["last_id"] <= above:
+                continue
+            with gzip.open(os.path.join(self.tenant_dir(tenant), segment["file"]), "rt", encoding="utf-8") as file:
+                for line in file:
+                    row = json.loads(line)
+                    row["date"] = datetime.fromisoformat(row["date"])
+                    if above is not None and row["log_id"] <= above:
+                        continue
+                    if start is not None and row["date"] < start:
+                        continue
+                    if end is not None and row["date"] >= end:
+                        continue
+                    if any(key in params and row[key] != params[key] for key in ("product_id", "user_id", "action")):
+                        continue
+                    yield row
+
+changelog_archive = ChangelogArchive()
+
+@click.command("archive-changelog")
+@click.option("--days", type=int, default=None, help="Entries older than this amount of days are archived. Defaults to CHANGELOG_RETENTION_DAYS.")
+@click.option("--segment-size", default=50_000, show_default=True, help="Maximum entries per segment file.")
+@click.option("--tenant", "tenant_slug", default=None, help="Only archives this restaurant (slug). Defaults to every restaurant.")
+@with_appcontext
+def archive_changelog(days, segment_size, tenant_slug):
+    """
+        Moves the old changelog entries to compressed segment files.
+
+        ### Usage
+            flask archive-changelog --days 90
+
+        ### Notes:
+        - Meant to run periodically (ex: a daily cron job).
+        - Archived entries are still returned by GET /products/changelog and /products/changelog/stats
+          when the request has a from or to filter.
+    """
+    days = changelog_archive.retention_days if days is None else days
+    cutoff = datetime.now() - timedelta(days=days)
+    query = db.select(tenants.tenant_id, tenants.slug).order_by(tenants.tenant_id)
+    if tenant_slug is not None:
+        query = query.where(tenants.slug == tenant_slug)
+    tenant_list = db.session.execute(query).all()
+    if not tenant_list:
+        raise click.UsageError(f"Unknown tenant: {tenant_slug}")
+    for tenant_id, slug in tenant_list:
+        click.echo(f"{slug}: {changelog_archive.archive(tenant_id, cutoff, segment_size)} entries archived")
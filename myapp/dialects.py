@@ -0,0 +1,41 @@
+from .extensions import db
+
+"""
+    Helpers for the differences between the supported databases (SQLite, MySQL/MariaDB, PostgreSQL).
+
+"""
+
+#Error codes of unique constraint violations.
+MYSQL_DUPLICATE_ENTRY = 1062
+POSTGRES_UNIQUE_VIOLATION = "23505"
+SQLITE_CONSTRAINT_UNIQUE = 2067
+
+def is_unique_violation(error):
+    """
+        Returns True if the IntegrityError was caused by a unique constraint.
+
+        Parameters:
+            `error`(IntegrityError): Exception raised by SQLAlchemy.
+    """
+    orig = getattr(error, "orig", error)
+    if getattr(orig, "pgcode", None) == POSTGRES_UNIQUE_VIOLATION or getattr(orig, "sqlstate", None) == POSTGRES_UNIQUE_VIOLATION:
+        return True
+    if getattr(orig, "sqlite_errorcode", None) == SQLITE_CONSTRAINT_UNIQUE:
+        return True
+    args = getattr(orig, "args", ())
+    if args and args[0] == MYSQL_DUPLICATE_ENTRY:
+        return True
+    #Older sqlite3 modules dont expose the error code.
+    return "UNIQUE constraint failed" in str(orig)
+
+def supports_delete_returning():
+    """
+        Returns True if the database supports DELETE ... RETURNING (SQLite 3.35+, MariaDB 10.5+, PostgreSQL).
+    """
+    return db.engine.dialect.delete_returning
+
+def supports_update_returning():
+    """
+        Returns True if the database supports UPDATE ... RETURNING (SQLite 3.35+, PostgreSQL).
+    """
+    return db.engine.dialect.update_returning
@@ -2,6 +2,9 @@ from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from flask_jwt_extended import JWTManager
+from .profiling import RequestProfiler
+from .governor import ConcurrencyGovernor
+from .ratelimit import RateLimiter
 
 """
     This file is used to prevent circular importation.
@@ -15,4 +18,10 @@ mail_extension = Mail()
 
 jwt = JWTManager()
 
-db = SQLAlchemy(model_class=Base)
\ No newline at end of file
+db = SQLAlchemy(model_class=Base)
+
+profiler = RequestProfiler()
+
+governor = ConcurrencyGovernor()
+
+limiter = RateLimiter()
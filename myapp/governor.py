@@ -0,0 +1,104 @@
+import threading
+from collections import Counter
+from flask import g, jsonify, request
+
+class ConcurrencyGovernor:
+    """
+        Limits the amount of requests being processed at the same time and sheds the excess with a 503.
+
+        ### Config:
+        - `GOVERNOR_CAPACITY (int)` Total in-flight requests allowed per worker. 0 disables the global limit.
+          Defaults to the threads of the gunicorn worker and must not exceed them.
+        - `GOVERNOR_LIMITS (dict)` In-flight limits by endpoint or blueprint, ex: {"bp_product.get_log": 2, "auth_bp": 4}.
+        - `GOVERNOR_PRIORITIES (dict)` Priority class by endpoint or blueprint, ex: {"bp_menu": "high"}.
+        - `GOVERNOR_CLASS_SHARES (dict)` Fraction of the capacity each class can use, ex: {"high": 1.0, "low": 0.5}.
+        - `GOVERNOR_DEFAULT_CLASS (str)` Class used when an endpoint has no priority.
+        - `GOVERNOR_RETRY_AFTER (int)` Seconds sent in the Retry-After header.
+
+        ### Notes:
+        - Endpoint keys take precedence over blueprint keys.
+        - Lower classes are rejected first: a class with share 0.5 is rejected once half of the capacity is in use,
+          leaving the rest for the higher classes.
+        - Counters are per worker, so the limits apply to threaded workers (ex: gunicorn gthread).
+        - Only requests that a thread already picked up are counted, requests waiting in gunicorn's queue
+          are not. The capacity reserves threads for the higher classes, it doesnt shorten that queue.
+        - When there is no capacity and no limits the hooks are not registered.
+    """
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.in_flight = Counter()
+        self.total = 0
+        self.rejected = Counter()
+        self.rules = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.capacity = int(app.config.get("GOVERNOR_CAPACITY") or 0)
+        self.limits = dict(app.config.get("GOVERNOR_LIMITS") or {})
+        self.priorities = dict(app.config.get("GOVERNOR_PRIORITIES") or {})
+        self.shares = dict(app.config.get("GOVERNOR_CLASS_SHARES") or {})
+        self.default_class = app.config.get("GOVERNOR_DEFAULT_CLASS", "normal")
+        self.retry_after = str(app.config.get("GOVERNOR_RETRY_AFTER", 1))
+        if not self.capacity and not self.limits:
+            return
+
+        app.before_request(self._acquire)
+        app.teardown_request(self._release)
+
+    def _lookup(self, table, endpoint):
+        if endpoint in table:
+            return endpoint, table[endpoint]
+        blueprint = endpoint.rpartition(".")[0]
+        if blueprint in table:
+            return blueprint, table[blueprint]
+        return None, None
+
+    def _rule(self, endpoint):
+        """
+            Returns (limit key, limit, class, maximum total in-flight) for the endpoint, cached after the first call.
+        """
+        rule = self.rules.get(endpoint)
+        if rule is None:
+            key, limit = self._lookup(self.limits, endpoint)
+            priority = self._lookup(self.priorities, endpoint)[1] or self.default_class
+            ceiling = self.capacity * self.shares.get(priority, 1.0) if self.capacity else None
+            rule = self.rules[endpoint] = (key, limit, priority, ceiling)
+        return rule
+
+    def _acquire(self):
+        endpoint = request.endpoint
+        if endpoint is None or endpoint == "static":
+            return
+        key, limit, priority, ceiling = self._rule(endpoint)
+
+        with self.lock:
+            if (ceiling is not None and self.total >= ceiling) or (limit is not None and self.in_flight[key] >= limit):
+                self.rejected[priority] += 1
+                busy = True
+            else:
+                self.total += 1
+                self.in_flight[key] += 1
+                busy = False
+
+        if busy:
+            response = jsonify({"error": "Server busy, try again later."})
+            response.status_code = 503
+            response.headers["Retry-After"] = self.retry_after
+            return response
+        g._governor_key = key
+
+    def _release(self, exc=None):
+        if "_governor_key" not in g:
+            return
+        key = g.pop("_governor_key")
+        with self.lock:
+            self.total -= 1
+            self.in_flight[key] -= 1
+
+    def stats(self):
+        """
+            Returns the current in-flight requests and the rejected requests by class.
+        """
+        with self.lock:
+            return {"in_flight": self.total, "rejected": dict(self.rejected)}
@@ -0,0 +1,180 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .models import idempotency_keys
+from .tenancy import current_tenant
+
+REPLAYED_HEADERS = ("Content-Type", "ETag", "Location")
+
+class IdempotencyStore:
+    """
+        Replays the stored response when a write request is retried with the same Idempotency-Key header.
+
+        ### Config:
+        - `IDEMPOTENCY_TTL_SECONDS (int)` Seconds a response is kept.
+        - `IDEMPOTENCY_LEASE_SECONDS (int)` Seconds a reservation lasts while its request is running.
+        - `IDEMPOTENCY_CACHE_SIZE (int)` Responses also kept in the worker's memory.
+
+        ### Usage:
+            @bp_product.route("/products/add", methods=["POST"])
+            @jwt_required()
+            @idempotency.idempotent
+            def add_product():
+
+        ### Notes:
+        - The key is reserved in the `idempotency_keys` table before running the view, the primary key
+          makes the reservation atomic between workers and hosts.
+        - Keys are scoped by tenant, endpoint and user, so two users can send the same key.
+        - Retries with a different body get a 422, retries while the first request is running get a 409.
+        - A reservation whose request never finished (ex: the worker was killed by the gunicorn timeout)
+          is taken over by the next retry once its lease expires. The lease must be longer than the request timeout.
+        - 5xx responses are not stored, the client can retry them.
+        - Requests without the header are not affected.
+    """
+    def __init__(self, app=None):
+        self.ttl = 86400
+        self.lease = 60
+        self.cache = OrderedDict()
+        self.cache_size = 1000
+        self.pruned = 0.0
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = int(app.config.get("IDEMPOTENCY_TTL_SECONDS", 86400))
+        self.lease = int(app.config.get("IDEMPOTENCY_LEASE_SECONDS", 60))
+        self.cache_size = int(app.config.get("IDEMPOTENCY_CACHE_SIZE", 1000))
+
+    def _scope_key(self, header):
+        try:
+            identity = get_jwt_identity()
+        except RuntimeError:
+            identity = None
+        return hashlib.sha256(f"{current_tenant()}\n{request.endpoint}\n{identity}\n{header}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.cache[key] = entry
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _cached(self, key):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self.cache[key]
+                return None
+            return entry
+
+    def _replay(self, status, body, headers):
+        response = make_response(body, status)
+        for name, value in (headers or {}).items():
+            response.headers[name] = value
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    def _prune(self):
+        #Deletes expired keys at most once a minute per worker.
+        now = time.monotonic()
+        if now - self.pruned < 60:
+            return
+        self.pruned = now
+        db.session.execute(db.delete(idempotency_keys).where(idempotency_keys.expires <= datetime.now()))
+
+    def _reserve(self, key, fingerprint):
+        """
+            Inserts the key. Returns None if reserved, otherwise the existing row.
+            Expired rows (old responses and abandoned reservations) are replaced.
+        """
+        for _ in range(2):
+            try:
+                self._prune()
+                #The reservation only lasts the lease, the response gets the full TTL once stored.
+                db.session.add(idempotency_keys(key=key, fingerprint=fingerprint, expires=datetime.now() + timedelta(seconds=self.lease)))
+                db.session.commit()
+                return None
+            except IntegrityError:
+                db.session.rollback()
+            row = db.session.get(idempotency_keys, key)
+            if row is None:
+                continue
+            if row.expires > datetime.now():
+                return row
+            #Only deletes the expired row, not a reservation another retry made in between.
+            db.session.execute(db.delete(idempotency_keys).where(idempotency_keys.key == key, idempotency_keys.expires == row.expires))
+            db.session.commit()
+        return db.session.get(idempotency_keys, key)
+
+    def _release(self, key):
+        db.session.rollback()
+        db.session.execute(db.delete(idempotency_keys).where(idempotency_keys.key == key))
+        db.session.commit()
+
+    def idempotent(self, view):
+        """
+            Decorator for write endpoints.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            header = request.headers.get("Idempotency-Key")
+            if header is None:
+                return view(*args, **kwargs)
+            if not header or len(header) > 255:
+                return jsonify({"error": "Idempotency-Key must have between 1 and 255 characters."}), 400
+
+            key = self._scope_key(header)
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+            cached = self._cached(key)
+            if cached is not None:
+                if cached[1] != fingerprint:
+                    return jsonify({"error": "Idempotency-Key was used with a different request."}), 422
+                return self._replay(*cached[2:])
+
+            try:
+                row = self._reserve(key, fingerprint)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Idempotency error: {e}")
+                return jsonify({"error": "An internal error occurred. Please try again later."}), 500
+            if row is not None:
+                if row.fingerprint != fingerprint:
+                    return jsonify({"error": "Idempotency-Key was used with a different request."}), 422
+                if row.status is None:
+                    return jsonify({"error": "A request with this Idempotency-Key is being processed."}), 409
+                self._remember(key, (row.expires.timestamp(), row.fingerprint, row.status, row.body, row.headers))
+                return self._replay(row.status, row.body, row.headers)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                self._release(key)
+                raise
+
+            if response.status_code >= 500 or response.is_streamed:
+                self._release(key)
+                return response
+
+            body = response.get_data()
+            headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+            try:
+                db.session.rollback()
+                db.session.execute(db.update(idempotency_keys).where(idempotency_keys.key == key).values(status=response.status_code, body=body, headers=headers, expires=datetime.now() + timedelta(seconds=self.ttl)))
+                db.session.commit()
+                self._remember(key, (time.time() + self.ttl, fingerprint, response.status_code, body, headers))
+            except Exception as e:
+                db.session.rollback()
+                print(f"Idempotency error: {e}")
+            return response
+        return wrapper
+
+idempotency = IdempotencyStore()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .models import products, menu_versions, menu_version_categories, menu_blobs
+from .tenancy import current_tenant
+
+"""
+    Versioned copies of the menu, used to answer "what did the menu look like on a given date".
+
+"""
+
+def category_products(categories=None, tenant=None):
+    """
+        Returns {category: [products]} with the available products, in the format of GET /products.
+
+        Parameters:
+            `categories`(list): Only reads these categories, None reads every category.
+            `tenant`(int): Tenant of the products, defaults to the tenant of the request.
+    """
+    query = (db.select(products.product_name, products.price, products.description, products.category)
+        .where(products.tenant_id == (tenant or current_tenant()), products.available == True))
+    if categories is not None:
+        query = query.where(products.category.in_(categories))
+    grouped = {category: [] for category in categories or ()}
+    for product in db.session.execute(query.order_by(products.category, products.product_id)).all():
+        grouped.setdefault(product[3], []).append(products.to_basic_dict(product[0], product[1], product[2], product[3]))
+    return grouped
+
+def store_blob(product_list):
+    """
+        Stores the compressed product list if its content is new and returns its digest.
+    """
+    raw = current_app.json.dumps(product_list).encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    if db.session.get(menu_blobs, digest) is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(menu_blobs(digest=digest, data=zlib.compress(raw)))
+        except IntegrityError:
+            #Another transaction stored the same content.
+            pass
+    return digest
+
+def create_menu_version(version, categories=None, tenant=None):
+    """
+        Saves the menu of the given catalog version. Must run in the transaction that changed the catalog.
+
+        Parameters:
+            `version`(int): New catalog version.
+            `categories`(list): Categories modified by the transaction, None if unknown.
+                The rest of the categories are copied from the previous version without reading the products.
+            `tenant`(int): Tenant of the menu, defaults to the tenant of the request.
+    """
+    tenant = tenant or current_tenant()
+    manifest = {}
+    if categories is not None:
+        previous = db.session.execute(
+            db.select(menu_version_categories.category, menu_version_categories.digest)
+            .where(menu_version_categories.tenant_id == tenant, menu_version_categories.version == db.select(db.func.max(menu_versions.version))
+                .where(menu_versions.tenant_id == tenant, menu_versions.version < version).scalar_subquery())
+        ).all()
+        manifest = {category: digest for category, digest in previous if category not in categories}
+
+    for category, product_list in category_products(categories, tenant).items():
+        if product_list:
+            manifest[category] = store_blob(product_list)
+
+    db.session.add(menu_versions(tenant_id=tenant, version=version, created=datetime.now()))
+    db.session.add_all(menu_version_categories(tenant_id=tenant, version=version, category=category, digest=digest) for category, digest in manifest.items())
+
+def read_menu_version(version=None, as_of=None):
+    """
+        Returns the product list of a menu version of the current tenant, or of the last version created before `as_of`.
+
+        Parameters:
+            `version`(int): Menu version.
+            `as_of`(datetime): Date of the menu.
+
+        Returns:
+            (version, product list), or (None, None) if there is no such version.
+    """
+    tenant = current_tenant()
+    if version is None:
+        version = db.select(db.func.max(menu_versions.version)).where(menu_versions.tenant_id == tenant, menu_versions.created <= as_of).scalar_subquery()
+    rows = db.session.execute(
+        db.select(menu_version_categories.version, menu_blobs.data)
+        .join(menu_blobs, menu_blobs.digest == menu_version_categories.digest)
+        .where(menu_version_categories.tenant_id == tenant, menu_version_categories.version == version)
+        .order_by(menu_version_categories.category)
+    ).all()
+    if not rows:
+        exists = db.session.execute(db.select(menu_versions.version).where(menu_versions.tenant_id == tenant, menu_versions.version == version)).scalar()
+        return (exists, []) if exists is not None else (None, None)
+    product_list = []
+    for _, data in rows:
+        product_list.extend(json.loads(zlib.decompress(data)))
+    return rows[0][0], product_list
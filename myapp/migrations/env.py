@@ -0,0 +1,29 @@
+import os
+from logging.config import fileConfig
+from alembic import context
+from dotenv import load_dotenv, find_dotenv
+from sqlalchemy import create_engine
+
+"""
+    Alembic environment. Used by `alembic upgrade head` and by create_app, which passes its own connection.
+
+"""
+
+config = context.config
+
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+def run_migrations(connection):
+    context.configure(connection=connection, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+connection = config.attributes.get("connection")
+if connection is not None:
+    run_migrations(connection)
+else:
+    load_dotenv(find_dotenv())
+    engine = create_engine(os.getenv("SQLALCHEMY_DATABASE_URI"))
+    with engine.connect() as connection:
+        run_migrations(connection)
@@ -0,0 +1,57 @@
+"""Tables of the first release
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-01-16 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    #Databases created before the migrations already have these tables.
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("user_id", sa.Integer, primary_key=True),
+            sa.Column("user_name", sa.String(50), nullable=False),
+            sa.Column("email", sa.String(150), nullable=False, unique=True),
+            sa.Column("password", sa.String(150), nullable=False),
+            sa.Column("verified", sa.Boolean)
+        )
+    if "products" not in tables:
+        op.create_table(
+            "products",
+            sa.Column("product_id", sa.Integer, primary_key=True),
+            sa.Column("product_name", sa.String(150), nullable=False),
+            sa.Column("price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("description", sa.String(250), nullable=False),
+            sa.Column("category", sa.String(50), nullable=False),
+            sa.Column("available", sa.Boolean),
+            sa.CheckConstraint("price > 0", name="check_price_positive")
+        )
+    if "log" not in tables:
+        op.create_table(
+            "log",
+            sa.Column("id_log", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("log", sa.String(250), nullable=False),
+            sa.Column("date", sa.DateTime, server_default=sa.func.now())
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("log")
+    op.drop_table("products")
+    op.drop_table("users")
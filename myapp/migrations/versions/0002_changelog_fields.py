@@ -0,0 +1,49 @@
+"""Structured changelog entries: product_id, action and changes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIONS = ("add", "update", "delete", "availability")
+INDEXES = {
+    "ix_log_product_date": ["product_id", "date"],
+    "ix_log_user_date": ["user_id", "date"],
+    "ix_log_action_date": ["action", "date"],
+    "ix_log_date": ["date"]
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("log")}
+    if "product_id" in columns:
+        #Created by db.create_all() with this schema.
+        return
+    with op.batch_alter_table("log") as batch:
+        batch.add_column(sa.Column("product_id", sa.Integer, nullable=True))
+        batch.add_column(sa.Column("action", sa.Enum(*ACTIONS, name="log_action"), nullable=True))
+        batch.add_column(sa.Column("changes", sa.JSON, nullable=True))
+    for name, index_columns in INDEXES.items():
+        op.create_index(name, "log", index_columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, "log")
+    with op.batch_alter_table("log") as batch:
+        batch.drop_column("changes")
+        batch.drop_column("action")
+        batch.drop_column("product_id")
@@ -0,0 +1,32 @@
+"""Product version used for optimistic concurrency
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("products")}
+    if "version" in columns:
+        return
+    #Existing products start at version 1.
+    with op.batch_alter_table("products") as batch:
+        batch.add_column(sa.Column("version", sa.Integer, nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("products") as batch:
+        batch.drop_column("version")
@@ -0,0 +1,179 @@
+"""Tenants: tenant_id on users, products and log, per tenant catalog versions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 12:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_TENANT = 1
+#Gives a name to the unnamed constraints reflected by SQLite, so they can be dropped.
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+OLD_LOG_INDEXES = {
+    "ix_log_product_date": ["product_id", "date"],
+    "ix_log_user_date": ["user_id", "date"],
+    "ix_log_action_date": ["action", "date"],
+    "ix_log_date": ["date"]
+}
+LOG_INDEXES = {
+    "ix_log_tenant_product_date": ["tenant_id", "product_id", "date"],
+    "ix_log_tenant_user_date": ["tenant_id", "user_id", "date"],
+    "ix_log_tenant_action_date": ["tenant_id", "action", "date"],
+    "ix_log_tenant_date": ["tenant_id", "date"]
+}
+
+
+def tenant_column(table):
+    return sa.Column("tenant_id", sa.Integer, sa.ForeignKey("tenants.tenant_id", name=f"fk_{table}_tenant"), nullable=False, server_default=str(DEFAULT_TENANT))
+
+def column_names(inspector, table):
+    return {column["name"] for column in inspector.get_columns(table)}
+
+def email_unique_name(inspector):
+    for constraint in inspector.get_unique_constraints("users"):
+        if constraint["column_names"] == ["email"]:
+            return constraint["name"] or "uq_users_email"
+    return None
+
+def create_tenant_tables(tables):
+    if "tenants" not in tables:
+        op.create_table(
+            "tenants",
+            sa.Column("tenant_id", sa.Integer, primary_key=True),
+            sa.Column("slug", sa.String(50), nullable=False, unique=True),
+            sa.Column("name", sa.String(150), nullable=False),
+            sa.Column("host", sa.String(255), nullable=True, unique=True)
+        )
+    tenants = sa.table("tenants", sa.column("tenant_id"), sa.column("slug"), sa.column("name"))
+    if op.get_bind().execute(sa.select(tenants.c.tenant_id).where(tenants.c.tenant_id == DEFAULT_TENANT)).first() is None:
+        op.bulk_insert(tenants, [{"tenant_id": DEFAULT_TENANT, "slug": "default", "name": "Default"}])
+
+def upgrade_users(inspector):
+    if "tenant_id" in column_names(inspector, "users"):
+        return
+    unique_name = email_unique_name(inspector)
+    with op.batch_alter_table("users", naming_convention=NAMING_CONVENTION) as batch:
+        if unique_name is not None:
+            batch.drop_constraint(unique_name, type_="unique")
+        batch.add_column(tenant_column("users"))
+        batch.create_unique_constraint("uq_users_tenant_email", ["tenant_id", "email"])
+        batch.create_index("ix_users_tenant_verified", ["tenant_id", "verified", "user_id"])
+
+def upgrade_products(inspector):
+    if "tenant_id" in column_names(inspector, "products"):
+        return
+    with op.batch_alter_table("products") as batch:
+        batch.add_column(tenant_column("products"))
+        batch.create_index("ix_products_tenant_available_category", ["tenant_id", "available", "category"])
+        batch.create_index("ix_products_tenant_category", ["tenant_id", "category"])
+
+def upgrade_log(inspector):
+    if "tenant_id" in column_names(inspector, "log"):
+        return
+    indexes = {index["name"] for index in inspector.get_indexes("log")}
+    with op.batch_alter_table("log") as batch:
+        batch.add_column(tenant_column("log"))
+        for name, columns in LOG_INDEXES.items():
+            batch.create_index(name, columns)
+        if op.get_bind().dialect.name == "mysql" and "ix_log_user_date" in indexes:
+            #MySQL needs an index that starts with user_id for the foreign key, it creates the same one on new tables.
+            batch.create_index("user_id", ["user_id"])
+        for name in OLD_LOG_INDEXES:
+            if name in indexes:
+                batch.drop_index(name)
+
+def upgrade_catalog_version(inspector, tables):
+    #Before tenants the table had a single row with id 1.
+    if "catalog_version" not in tables or "id" not in column_names(inspector, "catalog_version"):
+        return
+    version = op.get_bind().execute(sa.text("SELECT version FROM catalog_version WHERE id = 1")).scalar()
+    op.drop_table("catalog_version")
+    catalog_version = op.create_table(
+        "catalog_version",
+        sa.Column("tenant_id", sa.Integer, sa.ForeignKey("tenants.tenant_id"), primary_key=True),
+        sa.Column("version", sa.Integer, nullable=False)
+    )
+    if version is not None:
+        op.bulk_insert(catalog_version, [{"tenant_id": DEFAULT_TENANT, "version": version}])
+
+def upgrade_menu_versions(inspector, tables):
+    #The primary keys change, so the tables are copied to the new layout.
+    if "menu_versions" not in tables or "tenant_id" in column_names(inspector, "menu_versions"):
+        return
+    bind = op.get_bind()
+    old_versions = sa.table("menu_versions", sa.column("version", sa.Integer), sa.column("created", sa.DateTime))
+    old_categories = sa.table("menu_version_categories", sa.column("version", sa.Integer), sa.column("category", sa.String), sa.column("digest", sa.String))
+    versions = [dict(row) for row in bind.execute(sa.select(old_versions)).mappings()]
+    categories = []
+    if "menu_version_categories" in tables:
+        categories = [dict(row) for row in bind.execute(sa.select(old_categories)).mappings()]
+        op.drop_table("menu_version_categories")
+    op.drop_table("menu_versions")
+
+    menu_versions = op.create_table(
+        "menu_versions",
+        sa.Column("tenant_id", sa.Integer, sa.ForeignKey("tenants.tenant_id"), primary_key=True),
+        sa.Column("version", sa.Integer, primary_key=True),
+        sa.Column("created", sa.DateTime, nullable=False),
+        sa.Index("ix_menu_versions_tenant_created", "tenant_id", "created")
+    )
+    menu_version_categories = op.create_table(
+        "menu_version_categories",
+        sa.Column("tenant_id", sa.Integer, primary_key=True),
+        sa.Column("version", sa.Integer, primary_key=True),
+        sa.Column("category", sa.String(50), primary_key=True),
+        sa.Column("digest", sa.String(64), sa.ForeignKey("menu_blobs.digest"), nullable=False),
+        sa.ForeignKeyConstraint(["tenant_id", "version"], ["menu_versions.tenant_id", "menu_versions.version"])
+    )
+    op.bulk_insert(menu_versions, [{**row, "tenant_id": DEFAULT_TENANT} for row in versions])
+    op.bulk_insert(menu_version_categories, [{**row, "tenant_id": DEFAULT_TENANT} for row in categories])
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    create_tenant_tables(tables)
+    upgrade_users(inspector)
+    upgrade_products(inspector)
+    upgrade_log(inspector)
+    upgrade_catalog_version(inspector, tables)
+    upgrade_menu_versions(inspector, tables)
+
+
+def downgrade() -> None:
+    #Only the data of the default tenant can go back to the single tenant layout.
+    bind = op.get_bind()
+    for table in ("log", "products", "users"):
+        bind.execute(sa.text(f"DELETE FROM {table} WHERE tenant_id != :tenant"), {"tenant": DEFAULT_TENANT})
+    with op.batch_alter_table("log") as batch:
+        for name in LOG_INDEXES:
+            batch.drop_index(name)
+        for name, columns in OLD_LOG_INDEXES.items():
+            batch.create_index(name, columns)
+        batch.drop_constraint("fk_log_tenant", type_="foreignkey")
+        batch.drop_column("tenant_id")
+    with op.batch_alter_table("products") as batch:
+        batch.drop_index("ix_products_tenant_available_category")
+        batch.drop_index("ix_products_tenant_category")
+        batch.drop_constraint("fk_products_tenant", type_="foreignkey")
+        batch.drop_column("tenant_id")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_index("ix_users_tenant_verified")
+        batch.drop_constraint("uq_users_tenant_email", type_="unique")
+        batch.drop_constraint("fk_users_tenant", type_="foreignkey")
+        batch.drop_column("tenant_id")
+        batch.create_unique_constraint("uq_users_email", ["email"])
+    #Per tenant versions are rebuilt by the application on the next start.
+    for table in ("menu_version_categories", "menu_versions", "catalog_version", "tenants"):
+        op.drop_table(table)
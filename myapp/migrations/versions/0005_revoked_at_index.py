@@ -0,0 +1,31 @@
+"""Index on revoked_tokens.revoked_at, used by the denylist sync
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 12:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    #The table is created by db.create_all() when it doesnt exist.
+    if not inspector.has_table("revoked_tokens"):
+        return
+    if "ix_revoked_tokens_revoked_at" not in {index["name"] for index in inspector.get_indexes("revoked_tokens")}:
+        op.create_index("ix_revoked_tokens_revoked_at", "revoked_tokens", ["revoked_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_revoked_tokens_revoked_at", "revoked_tokens")
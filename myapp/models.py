@@ -1,8 +1,40 @@
 from .extensions import db
-from sqlalchemy import func, ForeignKey, String, Integer, Boolean, Numeric, CheckConstraint, DateTime
+from sqlalchemy import func, ForeignKey, String, Integer, Boolean, Numeric, CheckConstraint, DateTime, Enum, JSON, Index, LargeBinary, UniqueConstraint, ForeignKeyConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 import bcrypt
 
+DEFAULT_TENANT = 1
+
+class tenants(db.Model):
+    __tablename__ = "tenants"
+    """
+        Restaurants served by the application. Every product, user and change log belongs to one.
+
+        ### Keys:
+        - `tenant_id (Integer)` Primary key
+        - `slug (String)` Unique, used in the URL prefix /t/<slug>/
+        - `name (String)`
+        - `host (String)` Unique, optional domain of the restaurant (ex: menu.restaurant.com)
+
+        ### Methods:
+        - toDict()
+    """
+    tenant_id : Mapped[int] = mapped_column(Integer, primary_key=True)
+    slug : Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
+    name : Mapped[str] = mapped_column(String(150), nullable=False)
+    host : Mapped[str] = mapped_column(String(255), nullable=True, unique=True)
+
+    def toDict(self):
+        """
+            Returns a dictionary containing the tenant data.
+        """
+        return {
+                "tenant_id": self.tenant_id,
+                "slug": self.slug,
+                "name": self.name,
+                "host": self.host
+            }
+
 class users(db.Model):
     __tablename__ = "users"
     """
@@ -10,8 +42,9 @@ class users(db.Model):
 
         ### Keys:
         - `user_id (Integer)` Primary key
+        - `tenant_id (Integer)` Foreign key
         - `user_name (String)`
-        - `email (String)` Unique
+        - `email (String)` Unique per tenant
         - `password (String)`
         - `verified (Boolean)`
 
@@ -21,11 +54,15 @@ class users(db.Model):
         - check_password()
     """
     user_id : Mapped[int] = mapped_column(primary_key=True)
+    tenant_id : Mapped[int] = mapped_column(Integer, ForeignKey('tenants.tenant_id'), nullable=False, default=DEFAULT_TENANT, server_default=str(DEFAULT_TENANT))
     user_name : Mapped[str] = mapped_column(String(50), nullable=False)
-    email : Mapped[str] =  mapped_column(String(150), nullable=False, unique=True)
+    email : Mapped[str] =  mapped_column(String(150), nullable=False)
     password : Mapped[str] = mapped_column(String(150), nullable=False)
     verified : Mapped[bool] = mapped_column(Boolean, default=False)
-    __table_args__ = {'extend_existing': True} 
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "email", name="uq_users_tenant_email"),
+        Index("ix_users_tenant_verified", "tenant_id", "verified", "user_id"),
+        {'extend_existing': True})
 
     def toDict(self):
         """
@@ -44,18 +81,20 @@ class users(db.Model):
         """
         return {
             "user_id" : self.user_id,
+            "tenant_id" : self.tenant_id,
             "user_name" : self.user_name,
             "email" : self.email,
             "password" : self.password,
             "verified" : self.verified
         }
 
-    def hash_password(password: str) -> str:
+    def hash_password(password: str, rounds: int = 12) -> str:
         """
             Hashes and encodes the given password using bcrypt.
 
             Parameters:
                 `password`(str): Plain text password
+                `rounds`(int): bcrypt cost factor (default 12)
 
             Returns:
                 Hashed password as a string.
@@ -64,7 +103,7 @@ class users(db.Model):
                 mypassword = hash_password("supersecretpassword")
                 print(mypassword) # hashed
         """
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
         return hashed_password.decode('utf-8')
     
     def check_password(password: str, hashed_password: str):
@@ -95,23 +134,29 @@ class products(db.Model):
 
         ### Keys:
         - `product_id (Integer)` Primary key
+        - `tenant_id (Integer)` Foreign key
         - `product_name (String)`
         - `price (Float/Numeric)` Constraint price > 0
         - `description (String)`
         - `category (String)`
         - `available (Boolean)`
+        - `version (Integer)` Increased on every update, used for optimistic concurrency control
 
         ### Methods:
         - toDict() 
     """
     product_id : Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id : Mapped[int] = mapped_column(Integer, ForeignKey('tenants.tenant_id'), nullable=False, default=DEFAULT_TENANT, server_default=str(DEFAULT_TENANT))
     product_name: Mapped[str] = mapped_column(String(150), nullable=False)
     price : Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     description : Mapped[str] = mapped_column(String(250), nullable=False)
     category : Mapped[str] = mapped_column(String(50), nullable=False)
     available : Mapped[bool] = mapped_column(Boolean, default=True)
+    version : Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
     __table_args__ = (
-        CheckConstraint('price > 0', name='check_price_positive'),)
+        CheckConstraint('price > 0', name='check_price_positive'),
+        Index("ix_products_tenant_available_category", "tenant_id", "available", "category"),
+        Index("ix_products_tenant_category", "tenant_id", "category"),)
     
     def to_basic_dict(name, price, description, category):
         """
@@ -147,7 +192,8 @@ class products(db.Model):
                     "price" : 1500.0,
                     "description": somedescription,
                     "category": somecategory,
-                    "available": True
+                    "available": True,
+                    "version": 1
                 }
         """
         return {
@@ -156,11 +202,12 @@ class products(db.Model):
                 "price": self.price, 
                 "description": self.description,
                 "category": self.category,
-                "available": self.available
+                "available": self.available,
+                "version": self.version
             }
     
     def __repr__(self):
-        return f"id: {self.product_id}, product_name : {self.product_name}, price: {self.price}, description : {self.description}, category : {self.category}, available : {self.available}"
+        return f"id: {self.product_id}, product_name : {self.product_name}, price: {self.price}, description : {self.description}, category : {self.category}, available : {self.available}, version : {self.version}"
     
 class change_logg(db.Model):
     __tablename__ = "log"
@@ -169,17 +216,35 @@ class change_logg(db.Model):
 
         ### Keys:
         - `id_log (Integer)` Primary key
+        - `tenant_id (Integer)` Foreign key
         - `user_id (Integer)` Foreign key
         - `log (String)` Change (ex: user deleted a product.)
         - `date (Datetime)`
+        - `product_id (Integer)` Modified product, NULL for operations over several products
+        - `action (Enum)` One of ACTIONS
+        - `changes (JSON)` Modified fields and their new values
+
+        ### Indexes:
+        - (tenant_id, product_id, date), (tenant_id, user_id, date), (tenant_id, action, date) and (tenant_id, date)
 
         ### Methods:
         - toDict() 
     """
+    ACTIONS = ("add", "update", "delete", "availability")
+
     id_log : Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id : Mapped[int] = mapped_column(Integer, ForeignKey('tenants.tenant_id'), nullable=False, default=DEFAULT_TENANT, server_default=str(DEFAULT_TENANT))
     user_id : Mapped[int] = mapped_column(Integer, ForeignKey('users.user_id'), nullable=False)
     log : Mapped[str] = mapped_column(String(250), nullable=False)
     date : Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    product_id : Mapped[int] = mapped_column(Integer, nullable=True)
+    action : Mapped[str] = mapped_column(Enum(*ACTIONS, name="log_action"), nullable=True)
+    changes : Mapped[dict] = mapped_column(JSON, nullable=True)
+    __table_args__ = (
+        Index("ix_log_tenant_product_date", "tenant_id", "product_id", "date"),
+        Index("ix_log_tenant_user_date", "tenant_id", "user_id", "date"),
+        Index("ix_log_tenant_action_date", "tenant_id", "action", "date"),
+        Index("ix_log_tenant_date", "tenant_id", "date"),)
 
     def toDict(self):
         """
@@ -192,12 +257,130 @@ class change_logg(db.Model):
                     "log_id": 0, 
                     "user_id": 1, 
                     "log": User added a product., 
-                    "date": 2024-12-26 16:32:32
+                    "date": 2024-12-26 16:32:32,
+                    "product_id": 3,
+                    "action": "add",
+                    "changes": {"product_name": "somename", "price": 1500.0}
                 }
         """
         return {
                 "log_id": self.id_log, 
                 "user_id": self.user_id, 
                 "log": self.log, 
-                "date": self.date
-            }
\ No newline at end of file
+                "date": self.date,
+                "product_id": self.product_id,
+                "action": self.action,
+                "changes": self.changes
+            }
+
+class revoked_tokens(db.Model):
+    __tablename__ = "revoked_tokens"
+    """
+        Stores revoked JWTs.
+
+        ### Keys:
+        - `id_revocation (Integer)` Primary key
+        - `jti (String)` ID of the revoked token, NULL when every session of the user is revoked
+        - `user_id (Integer)` Foreign key
+        - `revoked_at (Datetime)` Tokens of the user issued before this date are revoked (only when jti is NULL)
+        - `expires (Datetime)` Date after which the row is no longer needed
+
+        ### Methods:
+        - toDict()
+    """
+    id_revocation : Mapped[int] = mapped_column(Integer, primary_key=True)
+    jti : Mapped[str] = mapped_column(String(36), nullable=True, index=True)
+    user_id : Mapped[int] = mapped_column(Integer, ForeignKey('users.user_id'), nullable=False)
+    revoked_at : Mapped[DateTime] = mapped_column(DateTime, nullable=False, index=True)
+    expires : Mapped[DateTime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def toDict(self):
+        """
+            Returns a dictionary containing the revocation data.
+        """
+        return {
+                "id_revocation": self.id_revocation,
+                "jti": self.jti,
+                "user_id": self.user_id,
+                "revoked_at": self.revoked_at,
+                "expires": self.expires
+            }
+
+class catalog_version(db.Model):
+    __tablename__ = "catalog_version"
+    """
+        Version of the product catalog of each tenant.
+        It is increased in the same transaction as every change to `products`.
+
+        ### Keys:
+        - `tenant_id (Integer)` Primary key, Foreign key
+        - `version (Integer)`
+    """
+    tenant_id : Mapped[int] = mapped_column(Integer, ForeignKey('tenants.tenant_id'), primary_key=True)
+    version : Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class menu_versions(db.Model):
+    __tablename__ = "menu_versions"
+    """
+        Immutable copy of the menu for each catalog version.
+
+        ### Keys:
+        - `tenant_id (Integer)` Primary key, Foreign key
+        - `version (Integer)` Primary key, same value as `catalog_version.version`
+        - `created (Datetime)`
+    """
+    tenant_id : Mapped[int] = mapped_column(Integer, ForeignKey('tenants.tenant_id'), primary_key=True)
+    version : Mapped[int] = mapped_column(Integer, primary_key=True)
+    created : Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    __table_args__ = (
+        Index("ix_menu_versions_tenant_created", "tenant_id", "created"),)
+
+class menu_version_categories(db.Model):
+    __tablename__ = "menu_version_categories"
+    """
+        Categories of a menu version. Unchanged categories point to the same blob in every version.
+
+        ### Keys:
+        - `tenant_id (Integer)` Primary key, Foreign key
+        - `version (Integer)` Primary key, Foreign key
+        - `category (String)` Primary key
+        - `digest (String)` Foreign key to `menu_blobs`
+    """
+    tenant_id : Mapped[int] = mapped_column(Integer, primary_key=True)
+    version : Mapped[int] = mapped_column(Integer, primary_key=True)
+    category : Mapped[str] = mapped_column(String(50), primary_key=True)
+    digest : Mapped[str] = mapped_column(String(64), ForeignKey('menu_blobs.digest'), nullable=False)
+    __table_args__ = (
+        ForeignKeyConstraint(["tenant_id", "version"], ["menu_versions.tenant_id", "menu_versions.version"]),)
+
+class menu_blobs(db.Model):
+    __tablename__ = "menu_blobs"
+    """
+        Compressed product list of a category, stored once per distinct content.
+
+        ### Keys:
+        - `digest (String)` Primary key, sha256 of the uncompressed JSON
+        - `data (LargeBinary)` zlib compressed JSON list of products
+    """
+    digest : Mapped[str] = mapped_column(String(64), primary_key=True)
+    data : Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+class idempotency_keys(db.Model):
+    __tablename__ = "idempotency_keys"
+    """
+        Stores the responses of write requests sent with an Idempotency-Key header.
+
+        ### Keys:
+        - `key (String)` Primary key, sha256 of the endpoint, the user and the header value
+        - `fingerprint (String)` sha256 of the request body
+        - `status (Integer)` Response status, NULL while the request is being processed
+        - `body (LargeBinary)` Response body
+        - `headers (JSON)` Response headers replayed with the body
+        - `expires (Datetime)`
+    """
+    key : Mapped[str] = mapped_column(String(64), primary_key=True)
+    fingerprint : Mapped[str] = mapped_column(String(64), nullable=False)
+    status : Mapped[int] = mapped_column(Integer, nullable=True)
+    body : Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    headers : Mapped[dict] = mapped_column(JSON, nullable=True)
+    expires : Mapped[DateTime] = mapped_column(DateTime, nullable=False, index=True)
@@ -0,0 +1,63 @@
+import cProfile
+import os
+import random
+import time
+from flask import g, request
+
+class RequestProfiler:
+    """
+        Profiles a sample of the requests with cProfile and dumps the stats to disk.
+
+        ### Config:
+        - `PROFILE_SAMPLE_RATE (float)` Fraction of requests profiled, from 0 to 1.
+        - `PROFILE_ENDPOINTS (set)` Endpoints that are always profiled, ex: {"bp_product.get_products_data"}.
+        - `PROFILE_DIR (str)` Folder where the .prof files are written.
+
+        ### Output:
+        - One file per profiled request named `<endpoint>.<duration>ms.<timestamp>.prof`.
+        - Files use the pstats format, they can be opened with `python -m pstats`, snakeviz or flameprof.
+
+        ### Notes:
+        - When the sample rate is 0 and there are no endpoints the hooks are never registered, so it costs nothing.
+    """
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.endpoints = set()
+        self.directory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = float(app.config.get("PROFILE_SAMPLE_RATE") or 0)
+        self.endpoints = set(app.config.get("PROFILE_ENDPOINTS") or ())
+        if self.sample_rate <= 0 and not self.endpoints:
+            return
+
+        self.directory = app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+
+    def _start(self):
+        if request.endpoint not in self.endpoints and random.random() >= self.sample_rate:
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            #Another profiler is already running on this thread.
+            return
+        g._profiler = (profiler, time.perf_counter())
+
+    def _stop(self, exc=None):
+        profiling = g.pop("_profiler", None)
+        if profiling is None:
+            return
+        profiler, start = profiling
+        profiler.disable()
+        duration = (time.perf_counter() - start) * 1000
+        filename = f"{request.endpoint or 'unknown'}.{duration:.0f}ms.{time.time_ns()}.prof"
+        try:
+            profiler.dump_stats(os.path.join(self.directory, filename))
+        except OSError as e:
+            print(f"Profiler error: {e}")
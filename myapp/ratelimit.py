@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import jsonify, request
+
+class MemoryStore:
+    """
+        Keeps the token buckets in the worker's memory.
+        The least recently used buckets are evicted when there are more than `max_keys`.
+    """
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        """
+            Takes a token from the bucket.
+
+            Parameters:
+                `key`(str): Bucket key.
+                `capacity`(int): Maximum tokens in the bucket.
+                `rate`(float): Tokens refilled per second.
+
+            Returns:
+                Seconds to wait before the next token, 0 if the token was taken.
+        """
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.pop(key, None)
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+class RedisStore:
+    """
+        Keeps the token buckets in Redis so every worker shares them. Requires the `redis` package.
+    """
+    SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'time')
+        local tokens = capacity
+        if bucket[1] then
+            tokens = math.min(capacity, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+        end
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            wait = (1 - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'time', tostring(now))
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+        return tostring(wait)
+    """
+
+    def __init__(self, uri):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATELIMIT_STORAGE_URI requires the redis package (pip install redis).")
+        self.script = redis.Redis.from_url(uri).register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, rate):
+        return float(self.script(keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time()]))
+
+def parse_rule(rule):
+    """
+        Converts a "capacity/seconds" string into (capacity, tokens per second).
+
+        Example:
+            parse_rule("5/60") # 5 requests per minute, (5, 0.0833)
+    """
+    capacity, _, seconds = rule.partition("/")
+    return int(capacity), int(capacity) / float(seconds)
+
+class RateLimiter:
+    """
+        Token bucket rate limiter by client IP and by email.
+
+        ### Config:
+        - `RATELIMIT_ENABLED (bool)`
+        - `RATELIMIT_RULES (dict)` Rules by name, ex: {"login": {"ip": "20/60", "email": "5/300"}}.
+        - `RATELIMIT_MAX_KEYS (int)` Buckets kept in memory before evicting the oldest ones.
+        - `RATELIMIT_STORAGE_URI (str)` Optional redis URI used to share the buckets between workers.
+
+        ### Usage:
+            @auth_bp.route("/login", methods=["POST"])
+            @limiter.limit("login")
+            def login():
+
+        ### Notes:
+        - The check runs before the view, so rejected requests never reach bcrypt or SMTP.
+        - Behind a load balancer TRUSTED_PROXIES must be set, otherwise every client shares the proxy's IP bucket.
+        - The email is read from the "mail" key of the JSON payload, email buckets are kept per tenant.
+        - Rejected requests get a 429 response with a Retry-After header.
+    """
+    def __init__(self, app=None):
+        self.enabled = False
+        self.rules = {}
+        self.store = None
+        self.rejected = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATELIMIT_ENABLED", True)
+        self.rules = {
+            name: {scope: parse_rule(rule) for scope, rule in scopes.items()}
+            for name, scopes in (app.config.get("RATELIMIT_RULES") or {}).items()
+        }
+        uri = app.config.get("RATELIMIT_STORAGE_URI")
+        self.store = RedisStore(uri) if uri else MemoryStore(app.config.get("RATELIMIT_MAX_KEYS", 10000))
+
+    def _identifier(self, scope):
+        from .tenancy import current_tenant
+        if scope == "ip":
+            return request.remote_addr
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and isinstance(data.get("mail"), str):
+            return f"{current_tenant()}:{data['mail'].strip().lower()}"
+        return None
+
+    def check(self, name):
+        """
+            Consumes a token from every bucket of the rule.
+
+            Returns:
+                None if the request is allowed, otherwise a 429 response.
+        """
+        for scope, (capacity, rate) in self.rules.get(name, {}).items():
+            identifier = self._identifier(scope)
+            if identifier is None:
+                continue
+            try:
+                wait = self.store.consume(f"{name}:{scope}:{identifier}", capacity, rate)
+            except Exception as e:
+                #The limiter must never take down the endpoint.
+                print(f"Rate limiter error: {e}")
+                return None
+            if wait:
+                self.rejected[f"{name}:{scope}"] += 1
+                response = jsonify({"error": "Too many requests, try again later."})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(int(wait) + 1)
+                return response
+        return None
+
+    def limit(self, name):
+        """
+            Decorator that applies the named rule to a view.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.enabled:
+                    rejection = self.check(name)
+                    if rejection is not None:
+                        return rejection
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """
+            Returns the rejected requests by rule and scope.
+        """
+        return dict(self.rejected)
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from .extensions import db
+from .models import revoked_tokens
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_timestamp(date):
+    return date.replace(tzinfo=timezone.utc).timestamp()
+
+class TokenDenylist:
+    """
+        In-memory copy of the `revoked_tokens` table used to reject revoked JWTs without a query per request.
+
+        ### Config:
+        - `JWT_REVOCATION_SYNC_SECONDS (int)` Maximum seconds between syncs with the table.
+        - `JWT_REVOCATION_SYNC_MARGIN (int)` Seconds each sync reads again before the previous one. Must cover
+          the longest transaction and the clock difference between hosts.
+
+        ### Notes:
+        - Each sync only reads the rows revoked since the previous one (minus the margin). IDs are not used
+          because auto increment values can be committed out of order. Rows read twice are ignored.
+        - Revocations made by this worker apply immediately, the ones made by other workers
+          apply after the next sync.
+        - Expired entries are dropped from memory, `flask auth prune-tokens` deletes them from the table.
+    """
+    def __init__(self, app=None):
+        self.jtis = {}
+        self.users = {}
+        self.synced_until = None
+        self.last_sync = None
+        self.interval = 5
+        self.margin = timedelta(seconds=60)
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get("JWT_REVOCATION_SYNC_SECONDS", 5)
+        self.margin = timedelta(seconds=app.config.get("JWT_REVOCATION_SYNC_MARGIN", 60))
+
+    def _add(self, row):
+        if row.jti is None:
+            revoked_at = to_timestamp(row.revoked_at)
+            self.users[row.user_id] = max(self.users.get(row.user_id, 0), revoked_at)
+        else:
+            self.jtis[row.jti] = to_timestamp(row.expires)
+
+    def sync(self, force=False):
+        """
+            Loads the revocations added since the last sync.
+        """
+        now = time.monotonic()
+        if not force and self.last_sync is not None and now - self.last_sync < self.interval:
+            return
+        with self.lock:
+            if not force and self.last_sync is not None and now - self.last_sync < self.interval:
+                return
+            started = utcnow()
+            query = db.select(revoked_tokens).where(revoked_tokens.expires > started)
+            if self.synced_until is not None:
+                query = query.where(revoked_tokens.revoked_at >= self.synced_until - self.margin)
+            for row in db.session.execute(query).scalars():
+                self._add(row)
+            self.synced_until = started
+            self._prune_memory()
+            self.last_sync = now
+
+    def _prune_memory(self):
+        now = time.time()
+        self.jtis = {jti: expires for jti, expires in self.jtis.items() if expires > now}
+
+    def is_revoked(self, jwt_payload):
+        """
+            Returns True if the token was revoked by jti or by a "revoke all sessions" of its user.
+        """
+        self.sync()
+        if jwt_payload.get("jti") in self.jtis:
+            return True
+        if self.users:
+            user_id = json.loads(jwt_payload["sub"])["id"]
+            return jwt_payload.get("iat", 0) < self.users.get(user_id, 0)
+        return False
+
+    def revoke(self, jwt_payload):
+        """
+            Revokes a single token (logout). The caller must commit the session.
+        """
+        user_id = json.loads(jwt_payload["sub"])["id"]
+        row = revoked_tokens(
+            jti=jwt_payload["jti"],
+            user_id=user_id,
+            revoked_at=utcnow(),
+            expires=datetime.fromtimestamp(jwt_payload["exp"], timezone.utc).replace(tzinfo=None)
+        )
+        db.session.add(row)
+        self._add(row)
+
+    def revoke_all(self, user_id, lifetime):
+        """
+            Revokes every token issued to the user until now. The caller must commit the session.
+
+            Parameters:
+                `user_id`(int): User whose sessions are revoked.
+                `lifetime`(timedelta): Longest lifetime of a token, the row is kept until then.
+        """
+        #JWTs store "iat" in whole seconds, tokens issued in the same second as the revocation stay valid.
+        now = utcnow().replace(microsecond=0)
+        row = revoked_tokens(jti=None, user_id=user_id, revoked_at=now, expires=now + lifetime)
+        db.session.add(row)
+        self._add(row)
+
+    def prune(self):
+        """
+            Deletes the expired revocations from the table. Returns the amount of rows deleted.
+        """
+        result = db.session.execute(db.delete(revoked_tokens).where(revoked_tokens.expires <= utcnow()))
+        db.session.commit()
+        return result.rowcount
+
+denylist = TokenDenylist()
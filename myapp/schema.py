@@ -0,0 +1,37 @@
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from .extensions import db
+
+"""
+    Keeps the database schema up to date with the Alembic revisions in myapp/migrations.
+
+"""
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+def alembic_config(connection):
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.attributes["connection"] = connection
+    return config
+
+def upgrade_database():
+    """
+        Applies the pending migrations. Must run before db.create_all().
+
+        ### Notes:
+        - New databases are created from the models and marked as up to date.
+        - Databases created before the migrations existed have no alembic_version table,
+          they are upgraded from the first revision (every revision checks what already exists).
+        - Disable it with DB_AUTO_MIGRATE=False when several hosts start at the same time
+          and run `alembic upgrade head` once before deploying.
+    """
+    with db.engine.begin() as connection:
+        config = alembic_config(connection)
+        if not inspect(connection).has_table("users"):
+            db.metadata.create_all(connection)
+            command.stamp(config, "head")
+        else:
+            command.upgrade(config, "head")
@@ -0,0 +1,125 @@
+import click
+import random
+import time
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from .extensions import db
+from .models import users, products, change_logg, tenants, DEFAULT_TENANT
+from .catalog import bump_catalog_version
+
+"""
+    Synthetic data generator used to reproduce production sized tables locally.
+
+"""
+
+CATEGORIES = ["helados", "cafeteria", "bebidas", "postres", "tortas", "desayunos", "meriendas", "sandwiches", "ensaladas", "promociones"]
+ADJECTIVES = ["clasico", "especial", "grande", "chico", "doble", "casero", "light", "artesanal", "premium", "tostado"]
+NOUNS = ["cafe", "cortado", "capuccino", "submarino", "medialuna", "tostado", "licuado", "brownie", "cheesecake", "alfajor", "batido", "te", "limonada", "waffle", "crepe"]
+ACTIONS = {"add": "added", "update": "changed", "delete": "deleted"}
+
+def batched(total, size):
+    """
+        Yields the sizes of the batches needed to reach `total`.
+    """
+    while total > 0:
+        yield min(size, total)
+        total -= size
+
+def fake_product(rng):
+    name = f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)}"
+    return {
+        "product_name": name.capitalize(),
+        "price": round(rng.uniform(500, 20000), 2),
+        "description": f"{name} de la casa, {rng.choice(ADJECTIVES)} y {rng.choice(ADJECTIVES)}",
+        "category": rng.choice(CATEGORIES),
+        "available": rng.random() < 0.9
+    }
+
+@click.command("seed")
+@click.option("--products", "product_count", default=100_000, show_default=True, help="Amount of products to create.")
+@click.option("--users", "user_count", default=10_000, show_default=True, help="Amount of users to create.")
+@click.option("--logs", "log_count", default=1_000_000, show_default=True, help="Amount of changelog entries to create.")
+@click.option("--bcrypt-rounds", default=4, show_default=True, help="bcrypt cost used for the user passwords.")
+@click.option("--password", default="password", show_default=True, help="Plain text password of every generated user.")
+@click.option("--days", default=365, show_default=True, help="Changelog entries are spread over this amount of days.")
+@click.option("--batch-size", default=5_000, show_default=True, help="Rows sent per INSERT.")
+@click.option("--seed", "random_seed", type=int, default=None, help="Random seed, for reproducible datasets.")
+@click.option("--tenant", "tenant_slug", default=None, help="Slug of the restaurant that receives the data, defaults to the default tenant.")
+@with_appcontext
+def seed(product_count, user_count, log_count, bcrypt_rounds, password, days, batch_size, random_seed, tenant_slug):
+    """
+        Fills the database with synthetic products, users and changelog entries.
+
+        ### Usage
+            flask seed --products 100000 --users 10000 --logs 2000000
+            flask seed --tenant otro-local --products 5000
+
+        ### Notes:
+        - Rows are inserted in bulk (one executemany per batch) and committed per batch.
+        - Every user gets a real bcrypt hash with its own salt, so login timings are realistic.
+        - Generated users are verified and use the "@seed.example" domain.
+    """
+    tenant = DEFAULT_TENANT
+    if tenant_slug is not None:
+        tenant = db.session.execute(db.select(tenants.tenant_id).where(tenants.slug == tenant_slug)).scalar()
+        if tenant is None:
+            raise click.UsageError(f"Unknown tenant: {tenant_slug}")
+    rng = random.Random(random_seed)
+    start = time.perf_counter()
+
+    #Products
+    for size in batched(product_count, batch_size):
+        db.session.execute(db.insert(products), [dict(fake_product(rng), tenant_id=tenant) for _ in range(size)])
+        db.session.commit()
+    if product_count:
+        bump_catalog_version(tenant=tenant)
+        db.session.commit()
+    click.echo(f"Products: {product_count}")
+
+    #Users
+    offset = db.session.execute(db.select(db.func.coalesce(db.func.max(users.user_id), 0))).scalar()
+    for size in batched(user_count, batch_size):
+        rows = []
+        for _ in range(size):
+            offset += 1
+            rows.append({
+                "tenant_id": tenant,
+                "user_name": f"user{offset}",
+                "email": f"user{offset}@seed.example",
+                "password": users.hash_password(password, bcrypt_rounds),
+                "verified": True
+            })
+        db.session.execute(db.insert(users), rows)
+        db.session.commit()
+    click.echo(f"Users: {user_count} (bcrypt cost {bcrypt_rounds})")
+
+    #Changelog
+    if log_count:
+        authors = db.session.execute(db.select(users.user_id, users.user_name).where(users.tenant_id == tenant)).all()
+        first_product, last_product = db.session.execute(
+            db.select(db.func.coalesce(db.func.min(products.product_id), 1), db.func.coalesce(db.func.max(products.product_id), 1))
+            .where(products.tenant_id == tenant)
+        ).one()
+        if not authors:
+            raise click.UsageError("Changelog entries need at least one user.")
+        now = datetime.now()
+        for size in batched(log_count, batch_size):
+            rows = []
+            for _ in range(size):
+                user_id, user_name = rng.choice(authors)
+                action = rng.choice(list(ACTIONS))
+                product = fake_product(rng)
+                rows.append({
+                    "tenant_id": tenant,
+                    "user_id": user_id,
+                    "log": f"{user_name} {ACTIONS[action]} a product:  {product['product_name']}",
+                    "date": now - timedelta(seconds=rng.randrange(days * 86400 or 1)),
+                    "product_id": rng.randint(first_product, last_product),
+                    "action": action,
+                    "changes": {"product_name": product["product_name"]} if action == "delete" else product
+                })
+            db.session.execute(db.insert(change_logg), rows)
+            db.session.commit()
+    click.echo(f"Changelog entries: {log_count}")
+
+    click.echo(f"Done in {time.perf_counter() - start:.1f}s")
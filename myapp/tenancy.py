@@ -0,0 +1,135 @@
+import threading
+import time
+import click
+from flask import g, has_app_context, jsonify, request
+from flask.cli import with_appcontext
+from .extensions import db
+from .models import tenants, DEFAULT_TENANT
+
+TENANT_ENVIRON_KEY = "myapp.tenant"
+
+def current_tenant():
+    """
+        Returns the ID of the tenant of the current request, the default tenant outside of requests.
+    """
+    if has_app_context():
+        return g.get("tenant_id", DEFAULT_TENANT)
+    return DEFAULT_TENANT
+
+class TenantPrefixMiddleware:
+    """
+        Serves every route under /t/<slug>/ by moving the prefix from PATH_INFO to SCRIPT_NAME,
+        so url_for keeps generating links inside the tenant.
+    """
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith("/t/"):
+            slug, _, rest = path[3:].partition("/")
+            if slug:
+                environ[TENANT_ENVIRON_KEY] = slug
+                environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + f"/t/{slug}"
+                environ["PATH_INFO"] = "/" + rest
+        return self.wsgi_app(environ, start_response)
+
+class TenantResolver:
+    """
+        Resolves the tenant of each request by URL prefix (/t/<slug>/...) or by host.
+
+        ### Config:
+        - `TENANT_REFRESH_SECONDS (int)` Seconds between reloads of the tenant table.
+
+        ### Notes:
+        - The tenant table is kept in memory, resolving a tenant doesnt query the database.
+        - Requests that dont match any host use the default tenant, so single restaurant
+          deployments keep working without configuration.
+        - Unknown slugs get a 404.
+        - Health checks are not resolved, so they keep answering while the database is down. If a reload
+          fails the previous tenant table is kept.
+    """
+    def __init__(self, app=None):
+        self.by_slug = {}
+        self.by_host = {}
+        self.loaded = None
+        self.interval = 60
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = int(app.config.get("TENANT_REFRESH_SECONDS", 60))
+        app.wsgi_app = TenantPrefixMiddleware(app.wsgi_app)
+        app.before_request(self._resolve)
+        app.cli.add_command(tenants_cli)
+
+    def reload(self):
+        with self.lock:
+            rows = db.session.execute(db.select(tenants.tenant_id, tenants.slug, tenants.host)).all()
+            self.by_slug = {slug: tenant_id for tenant_id, slug, _ in rows}
+            self.by_host = {host.lower(): tenant_id for tenant_id, _, host in rows if host}
+            self.loaded = time.monotonic()
+
+    def _resolve(self):
+        if request.blueprint == "bp_health":
+            return
+        if self.loaded is None or time.monotonic() - self.loaded >= self.interval:
+            try:
+                self.reload()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Tenant reload error: {e}")
+                if self.loaded is None:
+                    return jsonify({"error": "Service unavailable."}), 503
+                #Keeps the previous table and retries after another interval.
+                self.loaded = time.monotonic()
+        slug = request.environ.get(TENANT_ENVIRON_KEY)
+        if slug is not None:
+            tenant_id = self.by_slug.get(slug)
+            if tenant_id is None:
+                return jsonify({"error": "Unknown restaurant."}), 404
+        else:
+            tenant_id = self.by_host.get(request.host.split(":")[0].lower(), DEFAULT_TENANT)
+        g.tenant_id = tenant_id
+
+def ensure_default_tenant():
+    """
+        Creates the default tenant if it doesnt exist.
+    """
+    if db.session.get(tenants, DEFAULT_TENANT) is None:
+        db.session.add(tenants(tenant_id=DEFAULT_TENANT, slug="default", name="Default"))
+        db.session.commit()
+
+tenant_resolver = TenantResolver()
+
+@click.group("tenants")
+def tenants_cli():
+    """
+        Manages the restaurants served by the application.
+    """
+
+@tenants_cli.command("add")
+@click.argument("slug")
+@click.option("--name", default=None, help="Name of the restaurant, defaults to the slug.")
+@click.option("--host", default=None, help="Domain of the restaurant (ex: menu.restaurant.com).")
+@with_appcontext
+def add_tenant(slug, name, host):
+    """
+        Adds a restaurant, its menu is served at /t/<slug>/menu (and at the given host).
+    """
+    from .catalog import ensure_catalog_version
+    tenant = tenants(slug=slug, name=name or slug, host=host.lower() if host else None)
+    db.session.add(tenant)
+    db.session.commit()
+    ensure_catalog_version(tenant.tenant_id)
+    click.echo(f"Tenant {tenant.tenant_id} created: /t/{slug}/")
+
+@tenants_cli.command("list")
+@with_appcontext
+def list_tenants():
+    """
+        Lists the restaurants.
+    """
+    for tenant in db.session.execute(db.select(tenants).order_by(tenants.tenant_id)).scalars():
+        click.echo(f"{tenant.tenant_id}\t{tenant.slug}\t{tenant.host or '-'}\t{tenant.name}")
@@ -1,8 +1,10 @@
 from myapp import create_app
+from myapp.blueprints.health.health import warm_up
+import os
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True, host='192.168.0.11', port=5000)
-
-
+    #Development server, use gunicorn in production (see gunicorn.conf.py).
+    warm_up(app)
+    app.run(debug=os.getenv("FLASK_DEBUG", "True").lower() == "true", host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", 5000)))
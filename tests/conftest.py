@@ -0,0 +1,21 @@
+import pytest
+from myapp import create_app, db, products
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("SECRET_KEY", "test")
+    monkeypatch.setenv("SECURITY_SALT", "test")
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("CHANGELOG_ARCHIVE_DIR", str(tmp_path / "archive"))
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def product(app):
+    product = products(product_name="Milanesa", price=10, description="Con papas", category="Platos", available=True)
+    db.session.add(product)
+    db.session.commit()
+    return product
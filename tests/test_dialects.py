@@ -0,0 +1,44 @@
+import pymysql
+import pytest
+from sqlalchemy.exc import IntegrityError
+from myapp.dialects import is_unique_violation
+
+class FakeSqliteError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.sqlite_errorcode = code
+
+class FakePostgresError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.pgcode = code
+
+class FakePsycopgError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.sqlstate = code
+
+def integrity_error(orig):
+    return IntegrityError("INSERT INTO users ...", {}, orig)
+
+@pytest.mark.parametrize("orig", [
+    FakeSqliteError("UNIQUE constraint failed: users.tenant_id, users.email", 2067),
+    pymysql.err.IntegrityError(1062, "Duplicate entry 'a@b.com' for key 'uq_users_tenant_email'"),
+    FakePostgresError('duplicate key value violates unique constraint "uq_users_tenant_email"', "23505"),
+    FakePsycopgError('duplicate key value violates unique constraint "uq_users_tenant_email"', "23505")
+])
+def test_unique_violation(orig):
+    assert is_unique_violation(integrity_error(orig))
+
+@pytest.mark.parametrize("orig", [
+    FakeSqliteError("FOREIGN KEY constraint failed", 787),
+    FakeSqliteError("NOT NULL constraint failed: users.email", 1299),
+    pymysql.err.IntegrityError(1452, "Cannot add or update a child row: a foreign key constraint fails"),
+    FakePostgresError('insert or update on table "users" violates foreign key constraint', "23503"),
+    FakePsycopgError('null value in column "email" violates not-null constraint', "23502")
+])
+def test_other_integrity_errors(orig):
+    assert not is_unique_violation(integrity_error(orig))
+
+def test_sqlite_without_error_code():
+    assert is_unique_violation(integrity_error(Exception("UNIQUE constraint failed: users.email")))
@@ -0,0 +1,54 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+from myapp import db
+from myapp.idempotency import IdempotencyStore
+from myapp.models import idempotency_keys
+
+def make_view(app, calls):
+    store = IdempotencyStore(app)
+    @store.idempotent
+    def view():
+        calls.append(True)
+        return {"message": "Product added!"}, 201
+    return store, view
+
+def send(app, view, body=b'{"a": 1}'):
+    with app.test_request_context("/products/add", method="POST", data=body, headers={"Idempotency-Key": "abc"}):
+        response = app.make_response(view())
+        return response.status_code, response.headers.get("Idempotent-Replayed")
+
+def test_replay(app):
+    calls = []
+    store, view = make_view(app, calls)
+    assert send(app, view) == (201, None)
+    store.cache.clear()
+    assert send(app, view) == (201, "true")
+    assert send(app, view, b'{"a": 2}')[0] == 422
+    assert len(calls) == 1
+    row = db.session.execute(db.select(idempotency_keys)).scalar_one()
+    assert row.expires > datetime.now() + timedelta(seconds=store.ttl - 60)
+
+def test_pending_reservation(app):
+    calls = []
+    store, view = make_view(app, calls)
+    with app.test_request_context("/products/add", method="POST", headers={"Idempotency-Key": "abc"}):
+        key = store._scope_key("abc")
+    db.session.add(idempotency_keys(key=key, fingerprint=hashlib.sha256(b"").hexdigest(), expires=datetime.now() + timedelta(seconds=store.lease)))
+    db.session.commit()
+    assert send(app, view, b"")[0] == 409
+    assert not calls
+
+def test_abandoned_reservation(app):
+    #The worker that reserved the key was killed before storing the response.
+    calls = []
+    store, view = make_view(app, calls)
+    with app.test_request_context("/products/add", method="POST", headers={"Idempotency-Key": "abc"}):
+        key = store._scope_key("abc")
+    db.session.add(idempotency_keys(key=key, fingerprint="x", expires=datetime.now() - timedelta(seconds=1)))
+    db.session.commit()
+    #Skips the periodic cleanup, so the retry finds the expired row.
+    store.pruned = time.monotonic()
+    assert send(app, view) == (201, None)
+    assert send(app, view) == (201, "true")
+    assert len(calls) == 1
@@ -0,0 +1,29 @@
+import time
+import pytest
+from itsdangerous import BadSignature, SignatureExpired
+from myapp.blueprints.email.mail import get_serializer, load_token, reminder_salt
+
+def sign(payload, salt, age):
+    #Signs the token as if it had been issued `age` seconds ago.
+    serializer = get_serializer()
+    signer = serializer.make_signer(salt)
+    signer.get_timestamp = lambda: int(time.time() - age)
+    return signer.sign(serializer.dump_payload(payload)).decode("utf-8")
+
+def test_verification_token(app):
+    assert load_token(get_serializer(), sign([2, "A@B.com"], "test", 60)) == (2, "a@b.com")
+    with pytest.raises(SignatureExpired):
+        load_token(get_serializer(), sign([2, "a@b.com"], "test", 600))
+
+def test_reminder_token(app):
+    #Reminder links are read long after the batch is sent.
+    assert load_token(get_serializer(), sign([2, "a@b.com"], reminder_salt(), 86400)) == (2, "a@b.com")
+    with pytest.raises(SignatureExpired):
+        load_token(get_serializer(), sign([2, "a@b.com"], reminder_salt(), 8 * 86400))
+
+def test_old_token(app):
+    assert load_token(get_serializer(), sign("a@b.com", "test", 60)) == (1, "a@b.com")
+
+def test_wrong_token(app):
+    with pytest.raises(BadSignature):
+        load_token(get_serializer(), sign([2, "a@b.com"], "other", 60))
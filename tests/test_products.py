@@ -0,0 +1,99 @@
+import pytest
+from myapp import db, products
+from myapp.blueprints.product import products as product_module
+from myapp.blueprints.product.products import compare_and_swap, delete_product_row, invalid_value
+
+@pytest.fixture(params=[True, False], ids=["returning", "no_returning"])
+def returning(request, app, monkeypatch):
+    #Without RETURNING the handlers take the MySQL path.
+    monkeypatch.setattr(product_module, "supports_delete_returning", lambda: request.param)
+    monkeypatch.setattr(product_module, "supports_update_returning", lambda: request.param)
+    return request.param
+
+def current_row(ID):
+    return db.session.execute(db.select(products.product_name, products.category, products.version).where(products.product_id == ID)).first()
+
+def test_delete(returning, product):
+    assert delete_product_row(product.product_id, 1) == (("Milanesa", "Platos"), 200)
+    assert current_row(product.product_id) is None
+
+def test_delete_unconditional(returning, product):
+    assert delete_product_row(product.product_id, None) == (("Milanesa", "Platos"), 200)
+
+def test_delete_missing(returning, app):
+    assert delete_product_row(999, 1) == (None, 404)
+
+def test_delete_stale_version(returning, product):
+    assert delete_product_row(product.product_id, 5) == (1, 409)
+    assert current_row(product.product_id) is not None
+
+def test_delete_changed_after_read(product, monkeypatch):
+    #The row changes between the read and the DELETE of the MySQL path.
+    monkeypatch.setattr(product_module, "supports_delete_returning", lambda: False)
+    execute = db.session.execute
+    def concurrent_update(statement, *args, **kwargs):
+        if statement.is_delete:
+            execute(db.update(products).where(products.product_id == product.product_id).values(version=products.version + 1))
+        return execute(statement, *args, **kwargs)
+    monkeypatch.setattr(db.session, "execute", concurrent_update)
+    assert delete_product_row(product.product_id, 1) == (None, 409)
+    monkeypatch.undo()
+    assert current_row(product.product_id)[2] == 2
+
+def test_compare_and_swap(returning, product):
+    assert compare_and_swap(product.product_id, {"price": 12}, 1) == (200, 2, {"price": 12}, ["Platos"])
+    assert current_row(product.product_id)[2] == 2
+
+def test_compare_and_swap_unconditional(returning, product):
+    status, version, changes, categories = compare_and_swap(product.product_id, {"price": 12}, None)
+    #Without RETURNING the new version is unknown.
+    assert (status, version, changes, categories) == (200, 2 if returning else None, {"price": 12}, ["Platos"])
+
+def test_compare_and_swap_only_changed_fields(returning, product):
+    fields = {"product_name": "Milanesa", "price": 10.0, "description": "Con papas", "category": "Platos", "available": False}
+    assert compare_and_swap(product.product_id, fields, 1) == (200, 2, {"available": False}, ["Platos"])
+
+def test_compare_and_swap_nothing_changed(returning, product):
+    assert compare_and_swap(product.product_id, {"price": 10, "category": "Platos"}, None) == (200, 1, {}, [])
+    assert current_row(product.product_id)[2] == 1
+
+def test_compare_and_swap_category(returning, product):
+    status, version, changes, categories = compare_and_swap(product.product_id, {"category": "Postres"}, 1)
+    assert (status, version, changes, sorted(categories)) == (200, 2, {"category": "Postres"}, ["Platos", "Postres"])
+    assert current_row(product.product_id)[1] == "Postres"
+
+def test_compare_and_swap_missing(returning, app):
+    assert compare_and_swap(999, {"price": 12}, 1) == (404, None, None, None)
+
+def test_compare_and_swap_stale_version(returning, product):
+    assert compare_and_swap(product.product_id, {"price": 12}, 5) == (409, 1, None, None)
+    assert current_row(product.product_id)[2] == 1
+
+@pytest.mark.parametrize("values", [{"category": "Bebidas"}, {"price": 11}], ids=["category", "price"])
+def test_compare_and_swap_changed_after_read(returning, product, monkeypatch, values):
+    #Another request changes the product between the read and the UPDATE.
+    execute = db.session.execute
+    changed = []
+    def concurrent_update(statement, *args, **kwargs):
+        if statement.is_update and not changed:
+            changed.append(True)
+            execute(db.update(products).where(products.product_id == product.product_id).values(**values, version=products.version + 1))
+        return execute(statement, *args, **kwargs)
+    monkeypatch.setattr(db.session, "execute", concurrent_update)
+    assert compare_and_swap(product.product_id, {"price": 12}, None) == (409, 2, None, None)
+    monkeypatch.undo()
+    assert current_row(product.product_id)[2] == 2
+
+@pytest.mark.parametrize("key, value", [
+    ("price", -1), ("price", 0), ("price", "10"), ("price", True), ("price", float("nan")), ("price", 10 ** 8),
+    ("product_name", None), ("product_name", "  "), ("description", 5), ("category", "x" * 51),
+    ("available", "no"), ("available", 1)
+])
+def test_invalid_value(app, key, value):
+    assert invalid_value(key, value) is not None
+
+@pytest.mark.parametrize("key, value", [
+    ("price", 1500), ("price", 0.5), ("product_name", "Milanesa"), ("category", "x" * 50), ("available", False)
+])
+def test_valid_value(app, key, value):
+    assert invalid_value(key, value) is None